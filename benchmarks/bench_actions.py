@@ -0,0 +1,260 @@
+# File: bench_actions.py
+#
+# Copyright (c) 2018 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# of Phantom Cyber Corporation.
+""" Offline benchmark of every CiscotaConnector action against the local mock Tetration API.
+
+Usage: python bench_actions.py [--sensors 1000] [--flows 10000] [--scopes 100] [--users 100] [--roles 10]
+                               [--runs 3] [--actions get_flows,lookup_ip] [--output results.json]
+
+Each run executes in a forked process so that the peak memory of one action does not leak into the next one. The
+reported latency is the median over the runs, the throughput is the number of result rows per second and the peak
+memory is the growth of the maximum resident set size while the action ran. Caches are disabled so that every run
+queries the mock server.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import ciscota_connector  # noqa: E402
+from mock_tetration import FLOW_WINDOW_SECONDS, MockTetrationData, start_server  # noqa: E402
+
+ANNOTATIONS_CSV_ROWS = 1000
+
+
+class LocalVault(object):
+    """ Stand-in for the platform vault serving the files generated by the benchmark.
+    """
+
+    files = {}
+
+    @classmethod
+    def add_file(cls, name, file_path):
+
+        vault_id = uuid.uuid4().hex
+        cls.files[vault_id] = {"vault_id": vault_id, "name": name, "path": file_path}
+
+        return vault_id
+
+    @classmethod
+    def add_attachment(cls, file_path, container_id, file_name=None):
+
+        return {"succeeded": True, "vault_id": cls.add_file(file_name or os.path.basename(file_path), file_path)}
+
+    @classmethod
+    def get_vault_tmp_dir(cls):
+
+        return tempfile.gettempdir()
+
+    @classmethod
+    def get_file_info(cls, vault_id=None, container_id=None):
+
+        return [dict(info) for key, info in cls.files.iteritems() if vault_id in (None, key)]
+
+    @classmethod
+    def get_file_path(cls, vault_id):
+
+        return cls.files[vault_id]["path"]
+
+
+def _save_local_container(connector, container):
+    """ Stand-in for the platform container store, on poll only needs the ID of the saved container.
+    """
+
+    return True, "", uuid.uuid4().hex
+
+
+def _write_file(name, lines):
+
+    file_path = os.path.join(tempfile.mkdtemp(), name)
+
+    with open(file_path, "w") as file_obj:
+        for line in lines:
+            file_obj.write(line + "\n")
+
+    return file_path
+
+
+def _get_benchmarks(data):
+    """ Function that returns the benchmarked actions with their parameters.
+
+    :param data: object of MockTetrationData class
+    :return: list of (name, action identifier, parameters)
+    """
+
+    ips = [data.ip(index) for index in range(min(len(data.sensors), 100))]
+    scope_name = data.scopes[-1]["name"] if data.scopes else "Default"
+    flow_param = {"start_time": str(data.start_time), "end_time": str(data.end_time), "limit": len(data.flows)}
+
+    annotations_vault_id = LocalVault.add_file("annotations.csv", _write_file("annotations.csv", ["IP,Owner,Location"] + [
+        "{0},owner{1},site{2}".format(data.ip(index), index, index % 10) for index in range(ANNOTATIONS_CSV_ROWS)]))
+    ips_vault_id = LocalVault.add_file("ips.txt", _write_file("ips.txt", ips))
+
+    return [
+        ("test connectivity", "test_asset_connectivity", {}),
+        ("list endpoints", "list_endpoints", {}),
+        ("list scopes", "list_scopes", {}),
+        ("list user groups", "list_user_groups", {}),
+        ("list dimensions", "list_dimensions", {}),
+        ("list metrics", "list_metrics", {}),
+        ("get flows", "get_flows", flow_param),
+        ("get flows (paginate)", "get_flows", dict(flow_param, paginate=True)),
+        ("get flows (shard)", "get_flows", dict(flow_param, shard_minutes=24 * 60)),
+        ("get flows (columnar)", "get_flows", dict(flow_param, output_format="Columnar")),
+        ("get flows (vault ndjson)", "get_flows", dict(flow_param, output_format="Vault NDJSON")),
+        ("get flows (vault csv)", "get_flows", dict(flow_param, output_format="Vault CSV")),
+        ("get top flows", "get_top_flows", {"start_time": flow_param["start_time"], "end_time": flow_param["end_time"],
+                                            "dimension": "src_address", "metric": "fwd_bytes", "threshold": 10}),
+        ("lookup ip", "lookup_ip", {"ip": ips[0] if ips else "10.0.0.0"}),
+        ("lookup ip (vault)", "lookup_ip", {"vault_id": ips_vault_id}),
+        ("list annotations", "list_annotations", {"scope_name": scope_name}),
+        ("upload annotations", "upload_annotations", {"scope_name": scope_name, "operation": "Add",
+                                                      "vault_id": annotations_vault_id}),
+        ("upload annotations (sync)", "upload_annotations", {"scope_name": scope_name, "operation": "Sync",
+                                                             "vault_id": annotations_vault_id}),
+        ("flush annotations", "flush_annotations", {"scope_name": scope_name}),
+        ("on poll", "on_poll", {})
+    ]
+
+
+def _run_action(config, action, param, queue):
+    """ Function that runs one action in the current process and reports its measurements on the queue.
+
+    :param config: asset configuration
+    :param action: action identifier
+    :param param: action parameters
+    :param queue: queue to report (status, latency, rows, peak memory in KB) on
+    """
+
+    ciscota_connector.Vault = LocalVault
+    ciscota_connector.CiscotaConnector.save_container = _save_local_container
+
+    in_json = {
+        "action": action, "identifier": action, "asset_id": uuid.uuid4().hex, "config": config,
+        "parameters": [param]
+    }
+
+    connector = ciscota_connector.CiscotaConnector()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    result = json.loads(connector._handle_action(json.dumps(in_json), None))
+    latency = time.time() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    action_results = result if isinstance(result, list) else [result]
+    statuses = [item.get("status") for item in action_results if isinstance(item, dict)]
+    # A columnar data item holds total_rows rows, on poll saves its flows in containers and only counts them
+    rows = sum(data.get("total_rows", 1) if isinstance(data, dict) else 1
+               for item in action_results if isinstance(item, dict) for data in item.get("data") or []) or \
+        sum((item.get("summary") or {}).get("total_flows", 0) for item in action_results if isinstance(item, dict))
+
+    queue.put((all(status == "success" for status in statuses), latency, rows, peak_rss - baseline_rss))
+
+
+def _measure(config, action, param, runs):
+    """ Function that runs the action the given number of times, each in a forked process.
+
+    :param config: asset configuration
+    :param action: action identifier
+    :param param: action parameters
+    :param runs: number of runs
+    :return: dictionary of measurements
+    """
+
+    measurements = []
+
+    for _ in range(runs):
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=_run_action, args=(config, action, param, queue))
+        process.start()
+        process.join()
+        # An action raising an exception exits the process without reporting anything
+        measurements.append(queue.get() if not process.exitcode else (False, 0, 0, 0))
+
+    latencies = sorted(item[1] for item in measurements)
+    latency = latencies[len(latencies) // 2]
+    rows = measurements[-1][2]
+
+    return {
+        "success": all(item[0] for item in measurements), "latency": latency, "rows": rows,
+        "rows_per_second": rows / latency if latency else 0, "peak_memory_kb": max(item[3] for item in measurements)
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--flows", type=int, default=10000)
+    parser.add_argument("--scopes", type=int, default=100)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--roles", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--actions", help="Comma-separated action identifiers to run, all of them by default")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    data = MockTetrationData(sensors=args.sensors, flows=args.flows, scopes=args.scopes, users=args.users,
+                             roles=args.roles)
+    server = start_server(data)
+
+    config = {
+        "server_url": server.url, "api_key": "key", "api_secret": "secret", "verify_server_cert": False,
+        "sensor_cache_ttl": 0, "catalog_cache_ttl": 0, "flowsearch_cache_size": 0,
+        "max_requests_per_second": 0,
+        # The poll window ends before now by the ingestion delay, its lookback covers the whole mock flow window
+        "poll_lookback_minutes": (FLOW_WINDOW_SECONDS + ciscota_connector.CISCO_TA_FLOWSEARCH_CLOSED_WINDOW_DELAY) // 60
+    }
+    selected_actions = args.actions.split(",") if args.actions else None
+
+    results = []
+    print("{0:<26} {1:>8} {2:>10} {3:>8} {4:>12} {5:>10}".format(
+        "action", "status", "latency(s)", "rows", "rows/s", "peak(MB)"))
+
+    for name, action, param in _get_benchmarks(data):
+        if selected_actions and action not in selected_actions:
+            continue
+
+        result = _measure(config, action, param, args.runs)
+        result["name"] = name
+        results.append(result)
+        print("{0:<26} {1:>8} {2:>10.3f} {3:>8} {4:>12.1f} {5:>10.1f}".format(
+            name, "success" if result["success"] else "failed", result["latency"], result["rows"],
+            result["rows_per_second"], result["peak_memory_kb"] / 1024.0))
+
+    server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"sizes": vars(args), "results": results}, output_file, indent=4)
+
+    # Exit with a failure so that a broken action fails the CI job running the benchmark
+    if not all(result["success"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
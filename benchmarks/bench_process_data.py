@@ -0,0 +1,135 @@
+# File: bench_process_data.py
+#
+# Copyright (c) 2018 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# of Phantom Cyber Corporation.
+""" Micro-benchmark of CiscotaConnector._process_data against the previous recursive implementation.
+
+Usage: python bench_process_data.py [scopes.json] [iterations]
+
+scopes.json is a saved response of /openapi/v1/app_scopes, when it is not given a synthetic scope hierarchy is used.
+"""
+from __future__ import print_function
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from ciscota_connector import CiscotaConnector  # noqa: E402
+
+
+def _process_data_recursive(data):
+    """ Previous recursive implementation of CiscotaConnector._process_data.
+
+    :param data: data to process
+    :return: processed data
+    """
+
+    if isinstance(data, bool):
+        return data
+
+    if isinstance(data, int) or isinstance(data, float):
+        data = str(data)
+
+    if isinstance(data, list):
+        for index, item in enumerate(data):
+            data[index] = _process_data_recursive(item)
+
+    if isinstance(data, dict):
+        for key, value in data.iteritems():
+            data[key] = _process_data_recursive(value)
+
+    return data
+
+
+def _generate_scopes(total_scopes=500, query_depth=12):
+    """ Function that generates scopes with nested query filters.
+
+    :param total_scopes: number of scopes
+    :param query_depth: depth of the query filters
+    :return: list of scopes
+    """
+
+    scopes = []
+
+    for index in range(total_scopes):
+        query = {"type": "subnet", "field": "ip", "value": "10.{0}.0.0/16".format(index % 256)}
+        for depth in range(query_depth):
+            query = {"type": "and", "filters": [query, {"type": "eq", "field": "vrf_id", "value": depth}]}
+
+        scopes.append({
+            "id": "5a20a729755f024b00d57c{0:02x}".format(index % 256), "name": "Default:Scope{0}".format(index),
+            "vrf_id": 1, "policy_priority": 30, "dirty": False, "child_app_scope_ids": [],
+            "query": query, "short_query": query["filters"][0]
+        })
+
+    return scopes
+
+
+def _measure(function, raw_scopes, iterations):
+    """ Function that returns the best time of the function over all the iterations.
+
+    :param function: function to measure
+    :param raw_scopes: JSON text of the scopes
+    :param iterations: number of iterations
+    :return: best time in seconds, processed scopes
+    """
+
+    best_time = None
+    scopes = None
+
+    for _ in range(iterations):
+        # Every iteration processes fresh data as the conversion is done in place
+        scopes = json.loads(raw_scopes)
+        start_time = time.time()
+        for scope in scopes:
+            function(scope)
+        elapsed = time.time() - start_time
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    return best_time, scopes
+
+
+def main():
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as scopes_file:
+            raw_scopes = scopes_file.read()
+    else:
+        raw_scopes = json.dumps(_generate_scopes())
+
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    connector = CiscotaConnector()
+
+    recursive_time, recursive_scopes = _measure(_process_data_recursive, raw_scopes, iterations)
+    iterative_time, iterative_scopes = _measure(connector._process_data, raw_scopes, iterations)
+
+    if recursive_scopes != iterative_scopes:
+        print("Outputs differ")
+        return 1
+
+    print("scopes:    {0}".format(len(iterative_scopes)))
+    print("recursive: {0:.2f} ms".format(recursive_time * 1000))
+    print("iterative: {0:.2f} ms".format(iterative_time * 1000))
+    print("speedup:   {0:.2f}x".format(recursive_time / iterative_time if iterative_time else float('inf')))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# File: bench_view.py
+#
+# Copyright (c) 2018 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# of Phantom Cyber Corporation.
+""" Benchmark of the get flows rendering of ciscota_view against the previous implementation.
+
+Usage: python bench_view.py [total_flows ...]
+
+The flows are synthetic, 10000 and 100000 flows spread over an hour are rendered by default. The output of both
+implementations over all the flows is compared before timing them, the time to render the first page of the
+paginated view is reported as well.
+"""
+from __future__ import print_function
+
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import ciscota_view  # noqa: E402
+
+
+def _parse_data_previous(data):
+    """ Previous implementation of the get flows parsing of ciscota_view._parse_data.
+
+    :param data: list of flows
+    :return: list of flows
+    """
+
+    for item in data:
+        try:
+            if item.get("timestamp"):
+                item["timestamp"] = time.strftime(
+                    '%b %d %I:%M:%S %p', time.localtime(time.mktime(time.strptime(item["timestamp"],
+                                                                                  '%Y-%m-%dT%H:%M:%S.%fZ'))))
+
+            if item.get('start_timestamp'):
+                item['start_timestamp'] = time.strftime('%b %d %I:%M:%S %p',
+                                                        time.localtime(int(item['start_timestamp']) / 1000))
+
+            if type(item['dst_scope_name']) is unicode or type(item['dst_scope_name']) is str:
+                item['dst_scope_name'] = [item['dst_scope_name']]
+
+            if type(item['src_scope_name']) is unicode or type(item['src_scope_name']) is str:
+                item['src_scope_name'] = [item['src_scope_name']]
+
+        except ValueError:
+            pass
+
+    return data
+
+
+def _add_columns_previous(data):
+    """ Previous implementation of ciscota_view._add_columns.
+
+    :param data: list of flows
+    :return: list of columns to display
+    """
+
+    columns_dict = []
+    available_columns = list(set().union(*data))
+
+    columns_in_sequence = [
+        {"timestamp": None}, {"src_hostname": "host name"}, {"dst_hostname": "host name"},
+        {"src_address": "ip"}, {"dst_address": "ip"}, {"src_port": "port"}, {"dst_port": "port"},
+        {"proto": None}, {"start_timestamp": None}, {"src_scope_name": "cisco ta scope"},
+        {"dst_scope_name": "cisco ta scope"}, {"vrf_name": None}, {"srtt_usec": None},
+        {"total_network_latency_usec": None}, {"server_app_latency_usec": None},
+        {"fwd_pkts": None}, {"rev_pkts": None}, {"fwd_bytes": None}, {"rev_bytes": None}
+    ]
+
+    for column in columns_in_sequence:
+        if set(column.keys()) < set(available_columns):
+            columns_dict.append(column)
+
+    return columns_dict
+
+
+class _Result(object):
+    """ Stand-in for the action result handed over to the view.
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    def get_param(self):
+        return {}
+
+    def get_summary(self):
+        return {}
+
+    def get_data(self):
+        return self._data
+
+
+def _generate_flows(total_flows, window_seconds=3600):
+    """ Function that generates flows spread evenly over a time window.
+
+    :param total_flows: number of flows
+    :param window_seconds: duration of the window
+    :return: list of flows
+    """
+
+    start = int(time.time()) - window_seconds
+    flows = []
+
+    for index in range(total_flows):
+        epoch = start + index * window_seconds // total_flows
+        flows.append({
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(epoch)) + ".{0:03d}Z".format(index % 1000),
+            "start_timestamp": epoch * 1000 + index % 1000, "src_address": "10.0.0.{0}".format(index % 256),
+            "dst_address": "10.0.1.{0}".format(index % 256), "src_port": 1024 + index % 60000, "dst_port": 443,
+            "proto": "TCP", "src_hostname": "host-{0}".format(index % 256), "dst_hostname": "web",
+            "src_scope_name": "Default", "dst_scope_name": "Default:Web", "vrf_name": "Default",
+            "fwd_pkts": index % 100, "rev_pkts": index % 50, "fwd_bytes": index % 100 * 1500,
+            "rev_bytes": index % 50 * 1500
+        })
+
+    return flows
+
+
+def _render_all(data):
+    """ Function that renders all the flows with the current implementation, like the previous one did.
+
+    :param data: list of flows
+    :return: list of columns to display, list of flows
+    """
+
+    available_columns = set()
+    for item in data:
+        available_columns.update(item)
+
+    return ciscota_view._add_columns(available_columns), ciscota_view._parse_flows(data)
+
+
+def _time(function, flows):
+
+    start = time.time()
+    result = function(flows)
+    return time.time() - start, result
+
+
+def main():
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+
+    for total_flows in sizes:
+        flows = _generate_flows(total_flows)
+
+        previous_time, previous = _time(lambda data: (_add_columns_previous(data), _parse_data_previous(data)),
+                                        copy.deepcopy(flows))
+        current_time, current = _time(_render_all, copy.deepcopy(flows))
+        page_time, _ = _time(lambda data: ciscota_view._get_ctx_result("get flows", _Result(data)),
+                             copy.deepcopy(flows))
+
+        if current != previous:
+            print("{0} flows: the output differs from the previous implementation".format(total_flows))
+            sys.exit(1)
+
+        print("{0} flows: previous {1:.3f}s, current {2:.3f}s, speedup {3:.1f}x, first page {4:.3f}s".format(
+            total_flows, previous_time, current_time, previous_time / current_time, page_time))
+
+
+if __name__ == '__main__':
+    main()
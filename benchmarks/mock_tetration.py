@@ -0,0 +1,322 @@
+# File: mock_tetration.py
+#
+# Copyright (c) 2018 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# of Phantom Cyber Corporation.
+""" Local stand-in for the Tetration OpenAPI serving synthetic payloads, used by the offline benchmarks.
+
+Usage: python mock_tetration.py [--port 8080] [--sensors 1000] [--flows 10000] [--scopes 100] [--users 100] [--roles 10]
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import re
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+API_PREFIX = "/openapi/v1"
+FLOW_WINDOW_SECONDS = 7 * 86400
+
+DIMENSIONS = [
+    "timestamp", "start_timestamp", "src_address", "dst_address", "src_port", "dst_port", "proto", "src_hostname",
+    "dst_hostname", "src_scope_name", "dst_scope_name", "vrf_name"
+]
+METRICS = [
+    "fwd_pkts", "rev_pkts", "fwd_bytes", "rev_bytes", "srtt_usec", "total_network_latency_usec", "server_app_latency_usec"
+]
+
+
+class MockTetrationData(object):
+    """ This class generates the synthetic payloads served by the mock server.
+    """
+
+    def __init__(self, sensors=1000, flows=10000, scopes=100, users=100, roles=10):
+
+        self.end_time = int(time.time())
+        self.start_time = self.end_time - FLOW_WINDOW_SECONDS
+        self.sensors = [self._sensor(index) for index in range(sensors)]
+        self.flows = [self._flow(index, flows) for index in range(flows)]
+        self.scopes = [self._scope(index) for index in range(scopes)]
+        self.roles = [{"id": "role{0}".format(index), "name": "Role {0}".format(index)} for index in range(roles)]
+        self.users = [self._user(index, roles) for index in range(users)]
+        self.annotations = {}
+
+        # Payloads that do not depend on the request are serialized once
+        self.sensors_body = json.dumps({"results": self.sensors})
+
+    @staticmethod
+    def ip(index):
+        """ Function that returns the IP of the sensor with the given index.
+
+        :param index: index of the sensor
+        :return: IP address
+        """
+
+        return "10.{0}.{1}.{2}".format((index >> 16) & 255, (index >> 8) & 255, index & 255)
+
+    def _sensor(self, index):
+
+        return {
+            "uuid": "{0:040x}".format(index), "host_name": "host-{0}".format(index), "platform": "CentOS-7.3",
+            "agent_type": "Enforcement Agent", "current_sw_version": "2.0.2.20-1-enforcer",
+            "desired_sw_version": "2.0.2.20-1-enforcer", "cpu_quota_mode": 1, "cpu_quota_usec": 60000,
+            "data_plane_disabled": False, "enable_pid_lookup": False, "last_config_fetch_at": self.end_time,
+            "last_software_update_at": self.start_time, "deleted_at": None,
+            "interfaces": [
+                {"name": "lo", "ip": "127.0.0.1", "family_type": "IPV4", "netmask": "255.0.0.0",
+                 "mac": "00:00:00:00:00:00", "vrf": "Default"},
+                {"name": "eth0", "ip": self.ip(index), "family_type": "IPV4", "netmask": "255.255.0.0",
+                 "mac": "00:50:56:{0:02x}:{1:02x}:{2:02x}".format((index >> 16) & 255, (index >> 8) & 255, index & 255),
+                 "vrf": "Default"}
+            ]
+        }
+
+    def _flow(self, index, total_flows):
+
+        # Flows are spread evenly over the window, in timestamp order
+        epoch = self.start_time + index * FLOW_WINDOW_SECONDS // max(total_flows, 1)
+        sensors = max(len(self.sensors), 1)
+
+        return {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(epoch)), "start_timestamp": epoch * 1000,
+            "epoch": epoch, "src_address": self.ip(index % sensors), "dst_address": self.ip((index * 7 + 1) % sensors),
+            "src_port": 1024 + index % 60000, "dst_port": [22, 80, 443, 8080][index % 4], "proto": "TCP",
+            "src_hostname": "host-{0}".format(index % sensors), "dst_hostname": "host-{0}".format((index * 7 + 1) % sensors),
+            "src_scope_name": "Default", "dst_scope_name": "Default:Scope{0}".format(index % 10), "vrf_name": "Default",
+            "fwd_pkts": index % 100, "rev_pkts": index % 50, "fwd_bytes": index % 100 * 1500, "rev_bytes": index % 50 * 1500,
+            "srtt_usec": 100, "total_network_latency_usec": 200, "server_app_latency_usec": 300
+        }
+
+    def _scope(self, index):
+
+        parent_id = "{0:024x}".format(0) if index else None
+
+        return {
+            "id": "{0:024x}".format(index), "name": "Default:Scope{0}".format(index) if index else "Default",
+            "short_name": "Scope{0}".format(index) if index else "Default", "parent_app_scope_id": parent_id,
+            "description": "", "vrf_id": 1, "policy_priority": 30, "dirty": False, "updated_at": self.start_time,
+            "child_app_scope_ids": [], "filter_type": "AppScope", "priority": "000:001:Z", "short_priority": 1,
+            "query": {"type": "and", "filters": [{"type": "eq", "field": "vrf_id", "value": 1},
+                                                 {"type": "subnet", "field": "ip", "value": "10.{0}.0.0/16".format(index % 256)}]},
+            "short_query": {"type": "subnet", "field": "ip", "value": "10.{0}.0.0/16".format(index % 256)}
+        }
+
+    def _user(self, index, roles):
+
+        return {
+            "id": "user{0}".format(index), "email": "user{0}@example.com".format(index), "first_name": "User",
+            "last_name": str(index), "role_ids": ["role{0}".format(index % max(roles, 1)), "role{0}".format((index + 1) % max(roles, 1))]
+        }
+
+    def search_flows(self, body):
+        """ Function that searches the flows like the flowsearch API, with support for eq/or/and filters, t0/t1 given
+        in epoch, limit and offset.
+
+        :param body: flowsearch request body
+        :return: flowsearch response
+        """
+
+        t0 = int(body["t0"]) if str(body.get("t0", "")).isdigit() else self.start_time
+        t1 = int(body["t1"]) if str(body.get("t1", "")).isdigit() else self.end_time
+        limit = int(body.get("limit") or 100)
+        offset = int(body.get("offset") or 0)
+        query_filter = body.get("filter") or {}
+        fields = (body.get("dimensions") or []) + (body.get("metrics") or [])
+
+        results = []
+        next_offset = None
+        matched = 0
+
+        for flow in self.flows:
+            if not t0 <= flow["epoch"] < t1 or not self._match(flow, query_filter):
+                continue
+
+            matched += 1
+            if matched <= offset:
+                continue
+
+            if len(results) == limit:
+                next_offset = str(offset + limit)
+                break
+
+            row = dict(flow)
+            del row["epoch"]
+            if fields:
+                row = dict((key, value) for key, value in row.iteritems() if key in fields)
+            results.append(row)
+
+        response = {"results": results}
+        if next_offset:
+            response["offset"] = next_offset
+
+        return response
+
+    def top_flows(self, body):
+        """ Function that aggregates the flows like the flowsearch top N API.
+
+        :param body: top N flowsearch request body
+        :return: top N flowsearch response
+        """
+
+        search_body = dict(body, limit=len(self.flows), offset=0)
+        totals = {}
+
+        for flow in self.search_flows(search_body)["results"]:
+            value = flow.get(body["dimension"])
+            totals[value] = totals.get(value, 0) + (flow.get(body["metric"]) or 0)
+
+        top = sorted(totals.iteritems(), key=lambda item: item[1], reverse=True)[:int(body.get("threshold") or 10)]
+
+        return [{"result": [{body["dimension"]: value, body["metric"]: total} for value, total in top]}]
+
+    def _match(self, flow, query_filter):
+
+        if not query_filter:
+            return True
+
+        filter_type = query_filter.get("type")
+
+        if filter_type == "or":
+            return any(self._match(flow, item) for item in query_filter.get("filters", []))
+
+        if filter_type == "and":
+            return all(self._match(flow, item) for item in query_filter.get("filters", []))
+
+        if filter_type == "eq":
+            return str(flow.get(query_filter.get("field"))) == str(query_filter.get("value"))
+
+        return True
+
+
+class MockTetrationHandler(BaseHTTPRequestHandler):
+    """ This class serves the Tetration OpenAPI endpoints used by the connector.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, data, status_code=200):
+
+        body = data if isinstance(data, str) else json.dumps(data)
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_GET(self):
+
+        data = self.server.data
+        path = self.path.split("?")[0]
+        match = re.match(API_PREFIX + r"/assets/cmdb/annotations/(?P<scope_name>[^/]+)$", path)
+
+        if path == API_PREFIX + "/sensors":
+            self._send_json(data.sensors_body)
+        elif path == API_PREFIX + "/flowsearch/dimensions":
+            self._send_json(DIMENSIONS)
+        elif path == API_PREFIX + "/flowsearch/metrics":
+            self._send_json(METRICS)
+        elif path == API_PREFIX + "/app_scopes":
+            self._send_json(data.scopes)
+        elif path == API_PREFIX + "/roles":
+            self._send_json(data.roles)
+        elif path == API_PREFIX + "/users":
+            self._send_json(data.users)
+        elif match:
+            self._send_json(data.annotations.get(match.group("scope_name"), ["Owner", "Location"]))
+        else:
+            self._send_json({"error": "Not found"}, 404)
+
+    def do_POST(self):
+
+        data = self.server.data
+        path = self.path.split("?")[0]
+        body = self._read_body()
+
+        if path == API_PREFIX + "/flowsearch":
+            self._send_json(data.search_flows(json.loads(body)))
+        elif path == API_PREFIX + "/flowsearch/topn":
+            self._send_json(data.top_flows(json.loads(body)))
+        elif re.match(API_PREFIX + r"/assets/cmdb/upload/[^/]+$", path):
+            # The first line of the uploaded CSV is its header
+            csv_text = body.split("\r\n\r\n", 2)[-1] if "\r\n\r\n" in body else body
+            self._send_json({"warnings": [], "rows": max(csv_text.count("\n") - 1, 0)})
+        elif re.match(API_PREFIX + r"/assets/cmdb/flush/[^/]+$", path):
+            self._send_json({})
+        else:
+            self._send_json({"error": "Not found"}, 404)
+
+
+class MockTetrationServer(ThreadingMixIn, HTTPServer):
+    """ Threaded HTTP server holding the synthetic data.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, data):
+
+        HTTPServer.__init__(self, address, MockTetrationHandler)
+        self.data = data
+
+    @property
+    def url(self):
+        return "http://{0}:{1}".format(*self.server_address)
+
+
+def start_server(data, port=0):
+    """ Function that starts the mock server in a background thread.
+
+    :param data: object of MockTetrationData class
+    :param port: port to listen on, a free port is picked if 0
+    :return: object of MockTetrationServer class
+    """
+
+    server = MockTetrationServer(("127.0.0.1", port), data)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--sensors", type=int, default=1000)
+    parser.add_argument("--flows", type=int, default=10000)
+    parser.add_argument("--scopes", type=int, default=100)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--roles", type=int, default=10)
+    args = parser.parse_args()
+
+    data = MockTetrationData(sensors=args.sensors, flows=args.flows, scopes=args.scopes, users=args.users,
+                             roles=args.roles)
+    server = MockTetrationServer(("127.0.0.1", args.port), data)
+    print("Serving the mock Tetration API on {0}".format(server.url))
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
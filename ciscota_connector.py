@@ -16,10 +16,27 @@
 #
 # of Phantom Cyber Corporation.
 # Standard library imports
+import calendar
+import codecs
+import csv
+import gzip
+import hashlib
+import heapq
 import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
+from email.utils import mktime_tz, parsedate_tz
 from time import mktime
+from multiprocessing.pool import ThreadPool
+from operator import itemgetter
 import ipaddress
+import requests
 from bs4 import BeautifulSoup
 from tetpyclient import RestClient
 from tetpyclient import tetpyclient
@@ -41,6 +58,409 @@ class RetVal(tuple):
         return tuple.__new__(RetVal, (val1, val2))
 
 
+class FlowColumns(object):
+    """ This class accumulates flows column by column, the values of each key of the flows are held in one list
+    instead of one dictionary per flow, so the keys are stored once. A flow which does not have a key gets None in its
+    column.
+    """
+
+    def __init__(self):
+
+        self.schema = []
+        self.columns = []
+        self.total_rows = 0
+        self._index = {}
+
+    def add(self, flow):
+        """ Function that appends a flow to the columns.
+
+        :param flow: flow dictionary
+        """
+
+        for key, value in flow.iteritems():
+            index = self._index.get(key)
+            if index is None:
+                index = self._index[key] = len(self.schema)
+                self.schema.append(key)
+                self.columns.append([None] * self.total_rows)
+            self.columns[index].append(value)
+
+        self.total_rows += 1
+
+        # Pad the columns of the keys the flow does not have
+        if len(flow) < len(self.schema):
+            for column in self.columns:
+                if len(column) < self.total_rows:
+                    column.append(None)
+
+    def get_data(self):
+        """ Function that returns the columns as the data of an action result.
+
+        :return: dictionary of schema, columns and total rows
+        """
+
+        return {'schema': self.schema, 'columns': self.columns, 'total_rows': self.total_rows}
+
+
+class FlowExport(object):
+    """ This class streams flows into a gzip compressed NDJSON or CSV file, one flow at a time, so that they are not
+    held in memory. The header of a CSV file is the union of the keys of the first page of flows, which is buffered
+    until it is complete, the keys that only appear in later flows are not exported.
+    """
+
+    def __init__(self, output_format, directory):
+
+        self.output_format = output_format
+        self.file_name = CISCO_TA_EXPORT_FILE_NAME.format(timestamp=time.strftime('%Y%m%d%H%M%S', time.gmtime()),
+                                                          extension=CISCO_TA_EXPORT_FILE_EXTENSIONS[output_format])
+        self.total_rows = 0
+
+        file_descriptor, self.file_path = tempfile.mkstemp(dir=directory, suffix=self.file_name)
+        os.close(file_descriptor)
+
+        self._file = gzip.open(self.file_path, 'wb')
+        self._buffer = [] if output_format == CISCO_TA_OUTPUT_FORMAT_VAULT_CSV else None
+        self._writer = None
+
+    def add(self, flow):
+        """ Function that writes a flow to the file.
+
+        :param flow: flow dictionary
+        """
+
+        self.total_rows += 1
+
+        if self._buffer is None and self._writer is None:
+            self._file.write(json.dumps(flow))
+            self._file.write('\n')
+        elif self._writer is None:
+            self._buffer.append(flow)
+            if len(self._buffer) >= CISCO_TA_FLOWSEARCH_PAGE_SIZE:
+                self._write_header()
+        else:
+            self._write_row(flow)
+
+    def _write_header(self):
+
+        header = list(OrderedDict.fromkeys(key for flow in self._buffer for key in flow))
+        self._writer = csv.DictWriter(self._file, header, extrasaction='ignore')
+        self._writer.writeheader()
+
+        for flow in self._buffer:
+            self._write_row(flow)
+
+        self._buffer = None
+
+    def _write_row(self, flow):
+
+        row = {}
+        for key, value in flow.iteritems():
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value)
+            elif isinstance(value, unicode):
+                value = value.encode('utf-8')
+            row[key] = value
+
+        self._writer.writerow(row)
+
+    def close(self):
+        """ Function that writes the buffered flows and closes the file.
+        """
+
+        if self._buffer is not None:
+            self._write_header()
+
+        self._file.close()
+
+    def remove(self):
+        """ Function that closes and removes the file, if it was not moved to the vault.
+        """
+
+        self._file.close()
+
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+
+class FlowDeduplicator(object):
+    """ This class drops the flows already emitted by the previous runs of the asset. A flow is identified by a
+    fingerprint of its 5-tuple and start timestamp, the fingerprints of the most recently emitted flows are kept in a
+    bounded LRU which is persisted in a file next to the asset state. Flows emitted twice in the same run are both kept.
+    """
+
+    def __init__(self, fingerprints, max_size):
+
+        self._fingerprints = OrderedDict.fromkeys(fingerprints)
+        self._emitted = OrderedDict()
+        self._max_size = max_size
+        self.total_suppressed = 0
+        self.total_emitted = 0
+
+    @staticmethod
+    def get_fingerprint(flow):
+        """ Function that returns the fingerprint of a flow. A flow without any of the fingerprinted keys, as returned
+        when the dimensions do not include them, is fingerprinted as a whole.
+
+        :param flow: flow dictionary
+        :return: fingerprint
+        """
+
+        values = [flow.get(key) for key in CISCO_TA_FLOW_FINGERPRINT_KEYS]
+
+        if all(value is None for value in values):
+            values = flow
+
+        return hashlib.sha1(json.dumps(values, sort_keys=True)).hexdigest()[:CISCO_TA_FLOW_FINGERPRINT_LENGTH]
+
+    def is_new(self, flow):
+        """ Function that checks whether the flow was emitted by a previous run, and counts it as suppressed if so.
+
+        :param flow: flow dictionary
+        :return: True if the flow was not emitted by a previous run
+        """
+
+        fingerprint = self.get_fingerprint(flow)
+
+        if fingerprint in self._fingerprints:
+            # Refresh the fingerprint so that it is evicted last
+            del self._fingerprints[fingerprint]
+            self._fingerprints[fingerprint] = None
+            self.total_suppressed += 1
+            return False
+
+        self._emitted[fingerprint] = None
+        return True
+
+    def wrap(self, flow_handler):
+        """ Function that returns a flow handler that only hands over the new flows to the given one, and counts them.
+
+        :param flow_handler: function called for each new flow
+        :return: function called for each flow
+        """
+
+        def handler(flow):
+            if self.is_new(flow):
+                self.total_emitted += 1
+                flow_handler(flow)
+
+        return handler
+
+    def get_fingerprints(self):
+        """ Function that returns the fingerprints to persist, the most recently emitted last.
+
+        :return: list of fingerprints
+        """
+
+        fingerprints = list(self._fingerprints) + list(self._emitted)
+
+        return fingerprints[-self._max_size:] if self._max_size else []
+
+
+class TokenBucket(object):
+    """ This class paces the REST calls of all the threads of a connector run. Its rate is halved on every throttled
+    response and grows back additively on every successful one, up to the configured maximum rate.
+    """
+
+    def __init__(self, max_rate, rate=None):
+
+        self.max_rate = float(max_rate)
+        self.rate = min(float(rate or max_rate), self.max_rate)
+        self._tokens = 1.0
+        self._updated_at = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """ Function that blocks until a token is available and consumes it.
+        """
+
+        while True:
+            with self._lock:
+                now = time.time()
+                self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+
+                wait_time = (1.0 - self._tokens) / self.rate
+
+            time.sleep(wait_time)
+
+    def on_success(self):
+        """ Function that increases the rate after a successful response.
+        """
+
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + CISCO_TA_RATE_LIMIT_INCREASE)
+
+    def on_throttled(self):
+        """ Function that decreases the rate after a throttled response.
+        """
+
+        with self._lock:
+            self.rate = max(CISCO_TA_MIN_REQUESTS_PER_SECOND, self.rate / 2)
+
+
+class JsonResultsStream(object):
+    """ This class incrementally parses a streamed JSON response. Items of the 'results' array of a JSON object, or of
+    a top level JSON array, are handed over one at a time while the body is still being read, the other fields of the
+    JSON object are returned once the body has been parsed.
+    """
+
+    def __init__(self, response):
+
+        self._chunks = self._iter_text_chunks(response)
+        self._decoder = json.JSONDecoder()
+        self._buffer = u''
+        self._pos = 0
+
+        # Number of bytes of the body read and time spent waiting for them, used by the REST call stats
+        self.bytes_read = 0
+        self.read_time = 0
+
+    def _iter_text_chunks(self, response):
+        """ Generator that decodes the body of the response chunk by chunk.
+
+        :param response: streamed response
+        :return: yields decoded text
+        """
+
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')('replace')
+
+        for chunk in response.iter_content(chunk_size=CISCO_TA_STREAM_CHUNK_SIZE):
+            self.bytes_read += len(chunk)
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+
+        text = decoder.decode(b'', True)
+        if text:
+            yield text
+
+    def _read(self):
+        """ Function that appends the next chunk of the body to the buffer and drops the consumed part of it.
+
+        :return: False if the body is exhausted else True
+        """
+
+        start_time = time.time()
+        chunk = next(self._chunks, None)
+        self.read_time += time.time() - start_time
+
+        if chunk is None:
+            return False
+
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+
+        return True
+
+    def _peek(self):
+        """ Function that skips the whitespaces and returns the next character of the body.
+
+        :return: next character
+        """
+
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+
+            if not self._read():
+                raise ValueError("Unexpected end of JSON response")
+
+    def _expect(self, character):
+        """ Function that consumes the next character of the body, which must be the given one.
+
+        :param character: expected character
+        """
+
+        if self._peek() != character:
+            raise ValueError("Expecting '{0}' in JSON response".format(character))
+
+        self._pos += 1
+
+    def _value(self):
+        """ Function that decodes the next JSON value of the body, reading more chunks until it is complete.
+
+        :return: decoded value
+        """
+
+        self._peek()
+
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if not self._read():
+                    raise
+                continue
+
+            # A value that is not followed by a delimiter may be incomplete, like a number split over two chunks
+            if (end < len(self._buffer) and self._buffer[end] in ' \t\r\n,:]}') or not self._read():
+                self._pos = end
+                return value
+
+    def _array(self, result_handler):
+        """ Function that decodes a JSON array and passes its items to the handler one at a time.
+
+        :param result_handler: function called for each item
+        """
+
+        self._expect('[')
+
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            result_handler(self._value())
+
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+
+            self._expect(']')
+            return
+
+    def parse(self, result_handler):
+        """ Function that parses the body and passes each result to the handler.
+
+        :param result_handler: function called for each result
+        :return: dictionary of the other fields of the JSON object
+        """
+
+        fields = {}
+
+        if self._peek() == '[':
+            self._array(result_handler)
+            return fields
+
+        self._expect('{')
+
+        if self._peek() == '}':
+            return fields
+
+        while True:
+            key = self._value()
+            self._expect(':')
+
+            if key == 'results' and self._peek() == '[':
+                self._array(result_handler)
+            else:
+                fields[key] = self._value()
+
+            if self._peek() == ',':
+                self._pos += 1
+                continue
+
+            self._expect('}')
+            return fields
+
+
 class CiscotaConnector(BaseConnector):
     """ This is an AppConnector class that inherits the BaseConnector class. It implements various actions supported by
     ciscota and helper methods required to run the actions.
@@ -55,6 +475,27 @@ class CiscotaConnector(BaseConnector):
         self._api_secret = None
         self._server_url = None
         self._verify_server_cert = False
+        self._pool_size = None
+        self._max_workers = None
+        self._sensor_cache_ttl = None
+        self._catalog_cache_ttl = None
+        self._dedup_cache_size = None
+        self._flowsearch_cache_dir = None
+        self._flowsearch_cache_size = None
+        self._flowsearch_cache_ttl = None
+        self._retry_count = None
+        self._rate_limiter = None
+        self._debug_capture = None
+        self._debug_capture_bytes = None
+        self._rest_client = None
+        self._stream_rest_client = None
+        self._worker_pool = None
+        self._rest_stats = {}
+        self._rest_stats_lock = threading.Lock()
+        self._state = None
+        self._state_changes = set()
+        self._sensor_inventory_path = None
+        self._flow_fingerprints_path = None
 
         return
 
@@ -71,171 +512,655 @@ class CiscotaConnector(BaseConnector):
         self._api_key = config[CISCO_TA_CONFIG_API_KEY]
         self._api_secret = config[CISCO_TA_CONFIG_API_SECRET]
         self._verify_server_cert = config.get(CISCO_TA_CONFIG_VERIFY_SSL, False)
+        self._pool_size = config.get(CISCO_TA_CONFIG_POOL_SIZE, CISCO_TA_DEFAULT_POOL_SIZE)
 
-        # Custom validation for IP address
-        self.set_validator('ip', self._is_ip)
+        if not str(self._pool_size).isdigit() or int(self._pool_size) == 0:
+            self.debug_print(CISCO_TA_POOL_SIZE_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_POOL_SIZE_ERROR)
 
-        return phantom.APP_SUCCESS
+        self._pool_size = int(self._pool_size)
 
-    def _is_ip(self, ip_address):
-        """ Function that checks given address and return True if address is valid IPv4/IPv6 address.
+        self._max_workers = config.get(CISCO_TA_CONFIG_MAX_WORKERS, CISCO_TA_DEFAULT_MAX_WORKERS)
 
-        :param ip_address: IP address
-        :return: status (success/failure)
-        """
+        if not str(self._max_workers).isdigit() or int(self._max_workers) == 0:
+            self.debug_print(CISCO_TA_MAX_WORKERS_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_MAX_WORKERS_ERROR)
 
-        try:
-            # It validates both IPV4 and IPV6 address and throws
-            # Exception if it is an invalid IP
-            ipaddress.ip_address(unicode(ip_address))
-        except Exception as e:
-            self.debug_print("parameter 'ip' validation failed", e)
-            return False
+        self._max_workers = int(self._max_workers)
 
-        return True
+        self._sensor_cache_ttl = config.get(CISCO_TA_CONFIG_SENSOR_CACHE_TTL, CISCO_TA_DEFAULT_SENSOR_CACHE_TTL)
 
-    def _make_rest_call(self, endpoint, action_result, json_body=None, method="get", timeout=None, file_path=None):
-        """ Function that makes the REST call to the device. It is a generic function that can be called from various
-        action handlers.
+        if not str(self._sensor_cache_ttl).isdigit():
+            self.debug_print(CISCO_TA_SENSOR_CACHE_TTL_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_SENSOR_CACHE_TTL_ERROR)
 
-        :param endpoint: REST endpoint that needs to appended to the service address
-        :param action_result: object of ActionResult class
-        :param json_body: request body
-        :param method: get/post/put/delete (Default method will be 'get')
-        :param timeout: request timeout
-        :param file_path: path of a file to upload
-        :return: status success/failure (along with appropriate message), response obtained by making an API call
-        """
+        self._sensor_cache_ttl = int(self._sensor_cache_ttl) * 60
 
-        response_data = None
+        self._catalog_cache_ttl = config.get(CISCO_TA_CONFIG_CATALOG_CACHE_TTL, CISCO_TA_DEFAULT_CATALOG_CACHE_TTL)
 
-        # Prepare args
-        args = {
-            'api_key': self._api_key,
-            'api_secret': self._api_secret,
-            'verify': self._verify_server_cert
-        }
+        if not str(self._catalog_cache_ttl).isdigit():
+            self.debug_print(CISCO_TA_CATALOG_CACHE_TTL_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_CATALOG_CACHE_TTL_ERROR)
 
-        # If URL or credentials are invalid, it will throw an exception
-        try:
-            # Create rest_client object
-            rest_client = RestClient(self._server_url, **args)
-        except Exception as e:
-            self.debug_print(e)
-            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_ERROR_CONNECTING_SERVER),
-                          response_data)
+        self._catalog_cache_ttl = int(self._catalog_cache_ttl) * 60
 
-        try:
-            request_func = getattr(rest_client, method)
-        except AttributeError:
-            self.debug_print(CISCO_TA_ERR_API_UNSUPPORTED_METHOD.format(method=method))
-            # set the action_result status to error, the handler function will most probably return as is
-            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_ERR_API_UNSUPPORTED_METHOD.
-                                                   format(method=method)), response_data)
-        except Exception as e:
-            self.debug_print(CISCO_TA_EXCEPTION_OCCURRED, e)
-            # set the action_result status to error, the handler function will most probably return as is
-            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_EXCEPTION_OCCURRED), response_data)
+        self._debug_capture = config.get(CISCO_TA_CONFIG_DEBUG_CAPTURE, CISCO_TA_DEBUG_CAPTURE_ON_FAILURE)
+        self._debug_capture_bytes = config.get(CISCO_TA_CONFIG_DEBUG_CAPTURE_BYTES,
+                                               CISCO_TA_DEFAULT_DEBUG_CAPTURE_BYTES)
 
-        try:
-            # call request_func according to parameter passed
-            if method == 'upload':
-                response = request_func(file_path, endpoint, json_body)  # pylint: disable=E1121
-            else:
-                if json_body:
-                    response = request_func(endpoint, json_body=json.dumps(json_body))
-                elif file_path:
-                    response = request_func(file_path, endpoint)  # pylint: disable=E1121
-                else:
-                    if self.get_action_identifier() == 'test_asset_connectivity' and timeout:
-                        response = request_func(endpoint, timeout=timeout)
-                    else:
-                        response = request_func(endpoint)
+        if self._debug_capture not in CISCO_TA_DEBUG_CAPTURE_LIST:
+            self.debug_print(CISCO_TA_DEBUG_CAPTURE_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_DEBUG_CAPTURE_ERROR)
 
-        except Exception as e:
-            self.debug_print(CISCO_TA_EXCEPTION_OCCURRED)
-            return RetVal(action_result.set_status(phantom.APP_ERROR, "{error}. Details: {details}".
-                                                   format(error=CISCO_TA_ERROR_CONNECTING_SERVER, details=str(e))),
-                          response_data)
+        if not str(self._debug_capture_bytes).isdigit():
+            self.debug_print(CISCO_TA_DEBUG_CAPTURE_BYTES_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_DEBUG_CAPTURE_BYTES_ERROR)
 
-        return self._process_response(response, action_result)
+        self._debug_capture_bytes = int(self._debug_capture_bytes)
 
-    def _process_empty_response(self, response, action_result):
-        """ This function is used to process empty response.
+        self._dedup_cache_size = config.get(CISCO_TA_CONFIG_DEDUP_CACHE_SIZE, CISCO_TA_DEFAULT_DEDUP_CACHE_SIZE)
 
-        :param response: response data
-        :param action_result: object of Action Result
-        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
-        """
+        if not str(self._dedup_cache_size).isdigit():
+            self.debug_print(CISCO_TA_DEDUP_CACHE_SIZE_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_DEDUP_CACHE_SIZE_ERROR)
 
-        if response.status_code == 200:
-            return RetVal(phantom.APP_SUCCESS, {})
+        self._dedup_cache_size = int(self._dedup_cache_size)
 
-        return RetVal(action_result.set_status(phantom.APP_ERROR, "Empty response and no information in the header"),
-                      None)
+        self._flowsearch_cache_size = config.get(CISCO_TA_CONFIG_FLOWSEARCH_CACHE_SIZE,
+                                                 CISCO_TA_DEFAULT_FLOWSEARCH_CACHE_SIZE)
 
-    def _process_html_response(self, response, action_result):
-        """ This function is used to process html response.
+        if not str(self._flowsearch_cache_size).isdigit():
+            self.debug_print(CISCO_TA_FLOWSEARCH_CACHE_SIZE_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_FLOWSEARCH_CACHE_SIZE_ERROR)
 
-        :param response: response data
-        :param action_result: object of Action Result
-        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
-        """
+        self._flowsearch_cache_size = int(self._flowsearch_cache_size) * 1024 * 1024
 
-        # An html response, treat it like an error
-        status_code = response.status_code
+        self._flowsearch_cache_ttl = config.get(CISCO_TA_CONFIG_FLOWSEARCH_CACHE_TTL,
+                                                CISCO_TA_DEFAULT_FLOWSEARCH_CACHE_TTL)
 
-        try:
-            soup = BeautifulSoup(response.text, "html.parser")
-            error_text = soup.text
-            split_lines = error_text.split('\n')
-            split_lines = [x.strip() for x in split_lines if x.strip()]
-            error_text = '\n'.join(split_lines)
-        except Exception as e:
-            error_text = "Cannot parse error details"
-            self.debug_print(error_text, e)
+        if not str(self._flowsearch_cache_ttl).isdigit():
+            self.debug_print(CISCO_TA_FLOWSEARCH_CACHE_TTL_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_FLOWSEARCH_CACHE_TTL_ERROR)
 
-        message = "Status Code: {0}. Data from server:\n{1}\n".format(status_code, error_text.encode('utf-8'))
+        self._flowsearch_cache_ttl = int(self._flowsearch_cache_ttl) * 60
 
-        message = message.replace('{', '{{').replace('}', '}}')
+        # The flowsearch results of each asset are cached in their own directory, next to the state file
+        if self._flowsearch_cache_size:
+            self._flowsearch_cache_dir = os.path.join(self.get_state_dir(), CISCO_TA_FLOWSEARCH_CACHE_DIR,
+                                                      str(self.get_asset_id()))
 
-        if len(message) > 500:
-            message = CISCO_TA_ERROR_CONNECTING_SERVER
+        # The sensor inventory is too large to be loaded with the state by every action, it is cached in its own file
+        self._sensor_inventory_path = os.path.join(self.get_state_dir(), CISCO_TA_SENSOR_INVENTORY_FILE.format(
+            asset_id=self.get_asset_id()))
 
-        return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+        # Load the state of the asset, it holds the caches shared between the runs
+        self._state = self.load_state() or {}
 
-    def _process_json_response(self, response, action_result):
-        """ This function is used to process json response.
+        # The sensor inventory was kept in the state by the previous versions of the app
+        if CISCO_TA_STATE_SENSOR_INVENTORY in self._state:
+            del self._state[CISCO_TA_STATE_SENSOR_INVENTORY]
+            self._state_changes.add((CISCO_TA_STATE_SENSOR_INVENTORY, None))
 
-        :param response: response data
-        :param action_result: object of Action Result
-        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
-        """
+        # The flow fingerprints were kept in the state by the previous versions of the app, they are only loaded by the
+        # runs that deduplicate flows from their own file
+        self._flow_fingerprints_path = os.path.join(self.get_state_dir(), CISCO_TA_FLOW_FINGERPRINTS_FILE.format(
+            asset_id=self.get_asset_id()))
 
-        # Try a json parse
-        try:
-            resp_json = response.json()
-        except Exception as e:
-            self.debug_print("Unable to parse the response into a dictionary", e)
-            return RetVal(action_result.set_status(phantom.APP_ERROR, "Unable to parse JSON response. Error: {0}".
-                                                   format(str(e))), None)
+        if CISCO_TA_STATE_FLOW_FINGERPRINTS in self._state:
+            try:
+                self._write_json_file(self._flow_fingerprints_path, self._state[CISCO_TA_STATE_FLOW_FINGERPRINTS])
+            except (IOError, OSError) as e:
+                self.debug_print(CISCO_TA_FLOW_FINGERPRINTS_WRITE_ERROR, e)
+            else:
+                del self._state[CISCO_TA_STATE_FLOW_FINGERPRINTS]
+                self._state_changes.add((CISCO_TA_STATE_FLOW_FINGERPRINTS, None))
+
+        # The annotation fingerprints were kept in the state by the previous versions of the app, they are moved to
+        # their own files
+        if CISCO_TA_STATE_ANNOTATION_FINGERPRINTS in self._state:
+            try:
+                for scope_name, fingerprint in self._state[CISCO_TA_STATE_ANNOTATION_FINGERPRINTS].iteritems():
+                    self._write_json_file(self._get_annotation_fingerprint_path(scope_name), fingerprint)
+            except (IOError, OSError) as e:
+                self.debug_print(CISCO_TA_ANNOTATION_FINGERPRINT_WRITE_ERROR, e)
+            else:
+                del self._state[CISCO_TA_STATE_ANNOTATION_FINGERPRINTS]
+                self._state_changes.add((CISCO_TA_STATE_ANNOTATION_FINGERPRINTS, None))
 
-        if response.status_code == 200:
-            return RetVal(phantom.APP_SUCCESS, resp_json)
+        self._retry_count = config.get(CISCO_TA_CONFIG_RETRY_COUNT, CISCO_TA_DEFAULT_RETRY_COUNT)
 
-        message = "Error from server. Status Code: {0} Data from server: {1}".format(response.status_code,
-                                                                                     response.text.replace('{', '{{').
-                                                                                     replace('}', '}}'))
+        if not str(self._retry_count).isdigit():
+            self.debug_print(CISCO_TA_RETRY_COUNT_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_RETRY_COUNT_ERROR)
 
-        # Process the error returned in the json
-        if resp_json.get('error'):
-            message = "Error from server. Status Code: {0} Data from server: {1}".format(
-                response.status_code, resp_json['error'])
+        self._retry_count = int(self._retry_count)
 
-        return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+        max_requests_per_second = config.get(CISCO_TA_CONFIG_MAX_REQUESTS_PER_SECOND,
+                                             CISCO_TA_DEFAULT_MAX_REQUESTS_PER_SECOND)
 
-    def _process_text_response(self, response, action_result):
-        """ This function is used to parse text response.
+        try:
+            max_requests_per_second = float(max_requests_per_second)
+            if max_requests_per_second < 0:
+                raise ValueError(max_requests_per_second)
+        except (TypeError, ValueError):
+            self.debug_print(CISCO_TA_MAX_REQUESTS_PER_SECOND_ERROR)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_MAX_REQUESTS_PER_SECOND_ERROR)
+
+        # The rate learned from the throttled responses of the previous runs is the starting point of this run
+        if max_requests_per_second:
+            self._rate_limiter = TokenBucket(max_requests_per_second, self._state.get(CISCO_TA_STATE_REQUESTS_PER_SECOND))
+
+        # If URL or credentials are invalid, it will throw an exception
+        try:
+            # The retries are done by _make_rest_call, with backoff and pacing, so the adapter does not retry
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size, max_retries=0)
+
+            # Create one rest_client object, its session is shared by all the REST calls of this run
+            self._rest_client = self._create_rest_client(adapter)
+
+            # The streaming rest_client reads the response body lazily, over the same connection pool
+            self._stream_rest_client = self._create_rest_client(adapter, stream=True)
+        except Exception as e:
+            self.debug_print(e)
+            return self.set_status(phantom.APP_ERROR, CISCO_TA_ERROR_CONNECTING_SERVER)
+
+        # Custom validation for IP address
+        self.set_validator('ip', self._is_ip)
+
+        return phantom.APP_SUCCESS
+
+    def finalize(self):
+        """ This function gets called once all the param dictionary elements are looped over and no more handle_action
+        calls are left to be made. It stops the worker pool, logs the connection pool usage and closes the shared session.
+        """
+
+        if self._worker_pool:
+            self._worker_pool.close()
+            self._worker_pool.join()
+            self._worker_pool = None
+
+        # Save the state, this data is saved across actions and app upgrades
+        if self._state is not None:
+            if self._rate_limiter and self._rate_limiter.rate != self._state.get(CISCO_TA_STATE_REQUESTS_PER_SECOND):
+                self._set_state(CISCO_TA_STATE_REQUESTS_PER_SECOND, self._rate_limiter.rate)
+            self._save_state_changes()
+
+        if self._rest_client:
+            total_requests, total_connections = self._get_connection_pool_stats()
+            self.debug_print(CISCO_TA_CONNECTION_POOL_STATS.format(
+                requests=total_requests, connections=total_connections,
+                reused=max(total_requests - total_connections, 0)))
+            self._rest_client.session.close()
+            self._stream_rest_client.session.close()
+
+        return phantom.APP_SUCCESS
+
+    def _set_state(self, key, value, subkey=None):
+        """ Function that sets a key of the asset state, or a key of one of its dictionaries, and records the change so
+        that only the changed keys are saved.
+
+        :param key: key of the state
+        :param value: value to set
+        :param subkey: key of the dictionary of the state to set, the key of the state itself is set if None
+        """
+
+        if subkey is None:
+            self._state[key] = value
+        else:
+            self._state.setdefault(key, {})[subkey] = value
+
+        self._state_changes.add((key, subkey))
+
+    def _save_state_changes(self):
+        """ Function that saves the keys of the asset state changed by this run. Nothing is saved if no key changed,
+        else the changed keys are applied to the state saved last, so that the keys saved by a concurrent run in the
+        meantime are not overwritten with the values loaded by this run.
+        """
+
+        if not self._state_changes:
+            return
+
+        state = self.load_state() or {}
+
+        for key, subkey in self._state_changes:
+            if key not in self._state:
+                state.pop(key, None)
+            elif subkey is None:
+                state[key] = self._state[key]
+            else:
+                state.setdefault(key, {})[subkey] = self._state[key][subkey]
+
+        self.save_state(state)
+        self._state_changes = set()
+
+    def _write_json_file(self, file_path, data):
+        """ Function that writes data to a JSON file. The file is renamed once written, so that a concurrent read never
+        sees a partial file.
+
+        :param file_path: path of the file
+        :param data: data to write
+        """
+
+        directory = os.path.dirname(file_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(file_descriptor, 'w') as json_file:
+            json.dump(data, json_file, separators=(',', ':'))
+
+        os.rename(temp_path, file_path)
+
+    def _read_json_file(self, file_path):
+        """ Function that reads data from a JSON file.
+
+        :param file_path: path of the file
+        :return: data, or None if the file does not exist or is not valid JSON
+        """
+
+        try:
+            with open(file_path) as json_file:
+                return json.load(json_file)
+        except (IOError, ValueError):
+            return None
+
+    def _create_rest_client(self, adapter, stream=False):
+        """ Function that creates the RestClient object and mounts the keep-alive connection pool on its session, so
+        that the TLS handshake is done once per connection instead of once per REST call.
+
+        :param adapter: object of HTTPAdapter class holding the connection pool
+        :param stream: whether the session reads response bodies lazily
+        :return: object of RestClient class
+        """
+
+        # Prepare args
+        args = {
+            'api_key': self._api_key,
+            'api_secret': self._api_secret,
+            'verify': self._verify_server_cert
+        }
+
+        rest_client = RestClient(self._server_url, **args)
+        rest_client.session.stream = stream
+
+        for protocol in ['http://', 'https://']:
+            rest_client.session.mount(protocol, adapter)
+
+        return rest_client
+
+    def _get_worker_pool(self):
+        """ Function that returns the pool of worker threads shared by all the action handlers of this run. The pool
+        is created on first use and its size is taken from the asset configuration.
+
+        :return: object of ThreadPool class
+        """
+
+        if not self._worker_pool:
+            self._worker_pool = ThreadPool(self._max_workers)
+
+        return self._worker_pool
+
+    def _run_concurrently(self, calls):
+        """ Function that runs independent calls concurrently on the worker pool and waits for all of them. The calls
+        must not wait on the worker pool themselves.
+
+        :param calls: list of tuples of function and arguments
+        :return: list of results, in the order of the calls
+        """
+
+        worker_pool = self._get_worker_pool()
+        pending_calls = [worker_pool.apply_async(function, args) for function, args in calls]
+
+        return [pending.get() for pending in pending_calls]
+
+    def _get_connection_pool_stats(self):
+        """ Function that returns the number of requests sent and the number of connections opened by the session.
+
+        :return: total requests, total connections
+        """
+
+        total_requests = 0
+        total_connections = 0
+
+        for adapter in set(self._rest_client.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                total_requests += pool.num_requests
+                total_connections += pool.num_connections
+
+        return total_requests, total_connections
+
+    def _is_ip(self, ip_address):
+        """ Function that checks given address and return True if address is valid IPv4/IPv6 address or a comma
+        separated list of valid IPv4/IPv6 addresses.
+
+        :param ip_address: IP address
+        :return: status (success/failure)
+        """
+
+        ip_list = self._get_ip_list(ip_address)
+
+        if not ip_list:
+            return False
+
+        try:
+            # It validates both IPV4 and IPV6 address and throws
+            # Exception if it is an invalid IP
+            for ip in ip_list:
+                ipaddress.ip_address(unicode(ip))
+        except Exception as e:
+            self.debug_print("parameter 'ip' validation failed", e)
+            return False
+
+        return True
+
+    def _get_ip_list(self, ip_addresses):
+        """ Function that splits a comma or whitespace separated list of IP addresses.
+
+        :param ip_addresses: IP addresses
+        :return: list of IP addresses
+        """
+
+        return [ip for ip in re.split(r'[\s,]+', ip_addresses) if ip]
+
+    def _parse_time(self, value):
+        """ Function that converts a flowsearch time given in epoch or ISO 8601 format into epoch seconds.
+
+        :param value: time in epoch or ISO 8601 format
+        :return: epoch seconds or None if the time could not be parsed
+        """
+
+        value = str(value).strip().upper()
+
+        if value.isdigit():
+            return int(value)
+
+        match = re.match(CISCO_TA_ISO_8601_REGEX, value)
+        if not match:
+            return None
+
+        try:
+            epoch = calendar.timegm(time.strptime(match.group('datetime'), '%Y-%m-%dT%H:%M:%S'))
+        except ValueError:
+            return None
+
+        # Convert the time to UTC according to its offset
+        if match.group('sign'):
+            offset = int(match.group('hours')) * 3600 + int(match.group('minutes')) * 60
+            epoch = epoch - offset if match.group('sign') == '+' else epoch + offset
+
+        return epoch
+
+    def _make_rest_call(self, endpoint, action_result, json_body=None, method="get", timeout=None, file_path=None,
+                        result_handler=None, response_info=None):
+        """ Function that makes the REST call to the device. It is a generic function that can be called from various
+        action handlers. If result_handler is given, the response is streamed and each item of its 'results' array is
+        passed to result_handler while the body is being read, the other fields of the response are returned.
+
+        :param endpoint: REST endpoint that needs to appended to the service address
+        :param action_result: object of ActionResult class
+        :param json_body: request body
+        :param method: get/post/put/delete (Default method will be 'get')
+        :param timeout: request timeout
+        :param file_path: path of a file to upload
+        :param result_handler: function called for each result of a streamed response
+        :param response_info: dictionary in which the status code of the last response is set, if given
+        :return: status success/failure (along with appropriate message), response obtained by making an API call
+        """
+
+        response_data = None
+        rest_client = self._stream_rest_client if result_handler else self._rest_client
+
+        try:
+            request_func = getattr(rest_client, method)
+        except AttributeError:
+            self.debug_print(CISCO_TA_ERR_API_UNSUPPORTED_METHOD.format(method=method))
+            # set the action_result status to error, the handler function will most probably return as is
+            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_ERR_API_UNSUPPORTED_METHOD.
+                                                   format(method=method)), response_data)
+        except Exception as e:
+            self.debug_print(CISCO_TA_EXCEPTION_OCCURRED, e)
+            # set the action_result status to error, the handler function will most probably return as is
+            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_EXCEPTION_OCCURRED), response_data)
+
+        # prepare the arguments of request_func according to parameter passed
+        request_kwargs = {}
+        if method == 'upload':
+            request_args = (file_path, endpoint, json_body)
+        elif json_body:
+            request_args = (endpoint,)
+            request_kwargs['json_body'] = json.dumps(json_body)
+        elif file_path:
+            request_args = (file_path, endpoint)
+        else:
+            request_args = (endpoint,)
+            if self.get_action_identifier() == 'test_asset_connectivity' and timeout:
+                request_kwargs['timeout'] = timeout
+
+        start_time = time.time()
+
+        # Connection errors, throttled responses and server errors are retried with a backoff
+        for attempt in range(self._retry_count + 1):
+            if self._rate_limiter:
+                self._rate_limiter.acquire()
+
+            try:
+                response = request_func(*request_args, **request_kwargs)
+            except Exception as e:
+                if attempt < self._retry_count:
+                    self._wait_before_retry(endpoint, attempt, str(e))
+                    continue
+
+                self.debug_print(CISCO_TA_EXCEPTION_OCCURRED)
+                return RetVal(action_result.set_status(phantom.APP_ERROR, "{error}. Details: {details}".
+                                                       format(error=CISCO_TA_ERROR_CONNECTING_SERVER, details=str(e))),
+                              response_data)
+
+            self._record_rest_stats(endpoint, requests=1, ttfb=response.elapsed.total_seconds(),
+                                    bytes_out=int(response.request.headers.get('Content-Length') or 0))
+
+            if self._rate_limiter:
+                if response.status_code == 429:
+                    self._rate_limiter.on_throttled()
+                elif response.status_code < 400:
+                    self._rate_limiter.on_success()
+
+            if response.status_code in CISCO_TA_RETRY_STATUS_CODES and attempt < self._retry_count:
+                response.close()
+                self._wait_before_retry(endpoint, attempt, "Status Code: {0}".format(response.status_code),
+                                        response.headers.get('Retry-After'))
+                continue
+
+            break
+
+        if response_info is not None:
+            response_info['status_code'] = response.status_code
+
+        ret_val = self._process_response(response, action_result, result_handler, endpoint)
+        self._record_rest_stats(endpoint, latency=time.time() - start_time)
+
+        return ret_val
+
+    def _record_rest_stats(self, endpoint, **values):
+        """ Function that adds the given values to the stats of the REST calls made to the endpoint. Action handlers
+        run REST calls from the worker pool, hence the stats are updated under a lock.
+
+        :param endpoint: REST endpoint
+        :param values: values to add, keyed by the name of the stat
+        """
+
+        with self._rest_stats_lock:
+            endpoint_stats = self._rest_stats.get(endpoint)
+            if endpoint_stats is None:
+                endpoint_stats = self._rest_stats[endpoint] = dict.fromkeys(CISCO_TA_REST_STATS_KEYS, 0)
+
+            for key, value in values.iteritems():
+                endpoint_stats[key] += value
+
+    def _get_rest_stats(self, keys=CISCO_TA_REST_STATS_KEYS):
+        """ Function that returns the stats of the REST calls made since the last call to handle_action, one item per
+        endpoint. Times are in seconds and sizes in bytes.
+
+        :param keys: names of the stats to return
+        :return: list of dictionaries
+        """
+
+        with self._rest_stats_lock:
+            rest_stats = []
+            for endpoint in sorted(self._rest_stats):
+                endpoint_stats = {'endpoint': endpoint}
+                for key in keys:
+                    value = self._rest_stats[endpoint][key]
+                    endpoint_stats[key] = round(value, 3) if isinstance(value, float) else value
+                rest_stats.append(endpoint_stats)
+
+        return rest_stats
+
+    def _get_summary_message(self, summary):
+        """ Function that returns a status message listing the counts of a summary, such as "Total flows: 10".
+
+        :param summary: dictionary of summary
+        :return: status message
+        """
+
+        message = ', '.join('{0}: {1}'.format(key.replace('_', ' ').capitalize(), value)
+                            for key, value in sorted(summary.iteritems())
+                            if key != CISCO_TA_JSON_REST_STATS and not isinstance(value, (list, dict)))
+
+        return message or CISCO_TA_ACTION_SUCCESS_MSG
+
+    def _wait_before_retry(self, endpoint, attempt, reason, retry_after=None):
+        """ Function that sleeps before retrying a REST call. The delay given by the Retry-After header is honored,
+        else the delay is a random value up to an exponentially growing bound.
+
+        :param endpoint: REST endpoint being retried
+        :param attempt: number of the failed attempt, starting at 0
+        :param reason: reason of the retry
+        :param retry_after: value of the Retry-After header, in seconds or as an HTTP date
+        """
+
+        delay = None
+
+        if retry_after:
+            if retry_after.strip().isdigit():
+                delay = int(retry_after)
+            else:
+                retry_date = parsedate_tz(retry_after)
+                if retry_date:
+                    delay = mktime_tz(retry_date) - time.time()
+
+        if delay is None:
+            delay = random.uniform(0, CISCO_TA_RETRY_BACKOFF_FACTOR * (2 ** attempt))
+
+        delay = min(max(delay, 0), CISCO_TA_MAX_RETRY_DELAY)
+
+        self.debug_print(CISCO_TA_RETRYING_REQUEST.format(endpoint=endpoint, reason=reason, delay=delay))
+        time.sleep(delay)
+
+    def _process_empty_response(self, response, action_result):
+        """ This function is used to process empty response.
+
+        :param response: response data
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
+        """
+
+        if response.status_code == 200:
+            return RetVal(phantom.APP_SUCCESS, {})
+
+        return RetVal(action_result.set_status(phantom.APP_ERROR, "Empty response and no information in the header"),
+                      None)
+
+    def _process_html_response(self, response, action_result):
+        """ This function is used to process html response.
+
+        :param response: response data
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
+        """
+
+        # An html response, treat it like an error
+        status_code = response.status_code
+
+        try:
+            soup = BeautifulSoup(response.text, "html.parser")
+            error_text = soup.text
+            split_lines = error_text.split('\n')
+            split_lines = [x.strip() for x in split_lines if x.strip()]
+            error_text = '\n'.join(split_lines)
+        except Exception as e:
+            error_text = "Cannot parse error details"
+            self.debug_print(error_text, e)
+
+        message = "Status Code: {0}. Data from server:\n{1}\n".format(status_code, error_text.encode('utf-8'))
+
+        message = message.replace('{', '{{').replace('}', '}}')
+
+        if len(message) > 500:
+            message = CISCO_TA_ERROR_CONNECTING_SERVER
+
+        return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+
+    def _process_json_response(self, response, action_result):
+        """ This function is used to process json response.
+
+        :param response: response data
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
+        """
+
+        # Try a json parse
+        try:
+            resp_json = response.json()
+        except Exception as e:
+            self.debug_print("Unable to parse the response into a dictionary", e)
+            return RetVal(action_result.set_status(phantom.APP_ERROR, "Unable to parse JSON response. Error: {0}".
+                                                   format(str(e))), None)
+
+        if response.status_code == 200:
+            return RetVal(phantom.APP_SUCCESS, resp_json)
+
+        message = "Error from server. Status Code: {0} Data from server: {1}".format(response.status_code,
+                                                                                     response.text.replace('{', '{{').
+                                                                                     replace('}', '}}'))
+
+        # Process the error returned in the json
+        if resp_json.get('error'):
+            message = "Error from server. Status Code: {0} Data from server: {1}".format(
+                response.status_code, resp_json['error'])
+
+        return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+
+    def _process_json_stream(self, response, action_result, result_handler, endpoint=None):
+        """ This function is used to process a streamed json response.
+
+        :param response: response data
+        :param action_result: object of Action Result
+        :param result_handler: function called for each result
+        :param endpoint: REST endpoint to record the stats of the response against
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message), other response fields
+        """
+
+        start_time = time.time()
+        stream = JsonResultsStream(response)
+
+        try:
+            fields = stream.parse(result_handler)
+        except Exception as e:
+            self.debug_print("Unable to parse the response into a dictionary", e)
+            return RetVal(action_result.set_status(phantom.APP_ERROR, "Unable to parse JSON response. Error: {0}".
+                                                   format(str(e))), None)
+        finally:
+            response.close()
+            # The time spent waiting for the body is network time, the rest of the parse time is decoding
+            self._record_rest_stats(endpoint, bytes_in=stream.bytes_read,
+                                    decode_time=time.time() - start_time - stream.read_time)
+
+        return RetVal(phantom.APP_SUCCESS, fields)
+
+    def _process_text_response(self, response, action_result):
+        """ This function is used to parse text response.
 
         :param response: response data
         :param action_result: action_result: object of Action Result
@@ -258,175 +1183,1159 @@ class CiscotaConnector(BaseConnector):
 
         return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
 
-    def _process_response(self, response, action_result):
-        """ This function is used to process html response.
+    def _add_response_debug_data(self, response, action_result):
+        """ This function is used to store the response in debug data, the body is truncated to the configured number
+        of bytes and decoded only here.
 
         :param response: response data
         :param action_result: object of Action Result
-        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
         """
 
+        if not hasattr(action_result, 'add_debug_data'):
+            return
+
+        r_text = response.content[:self._debug_capture_bytes].decode(response.encoding or 'utf-8', 'replace')
+
+        action_result.add_debug_data({'r_status_code': response.status_code})
+        action_result.add_debug_data({'r_text': r_text})
+        action_result.add_debug_data({'r_headers': response.headers})
+
+    def _process_response(self, response, action_result, result_handler=None, endpoint=None):
+        """ This function is used to process the response and store it in debug data according to the configured debug
+        capture policy.
+
+        :param response: response data
+        :param action_result: object of Action Result
+        :param result_handler: function called for each result of a streamed response
+        :param endpoint: REST endpoint to record the stats of the response against
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
+        """
+
+        # A successful streamed json response is parsed while it is read, its body is not stored in debug data
+        if result_handler and response.status_code == 200 and 'json' in response.headers.get('Content-Type', ''):
+            if self._debug_capture == CISCO_TA_DEBUG_CAPTURE_TRUNCATED and hasattr(action_result, 'add_debug_data'):
+                action_result.add_debug_data({'r_status_code': response.status_code})
+                action_result.add_debug_data({'r_headers': response.headers})
+
+            return self._process_json_stream(response, action_result, result_handler, endpoint)
+
         # store the r_text in debug data, it will get dumped in the logs if the action fails
-        if hasattr(action_result, 'add_debug_data'):
-            action_result.add_debug_data({'r_status_code': response.status_code})
-            action_result.add_debug_data({'r_text': response.text})
-            action_result.add_debug_data({'r_headers': response.headers})
+        if self._debug_capture == CISCO_TA_DEBUG_CAPTURE_TRUNCATED:
+            self._add_response_debug_data(response, action_result)
+
+        # The body has already been read, the processing time is the decoding time
+        start_time = time.time()
+        ret_val = self._process_response_content(response, action_result)
+        self._record_rest_stats(endpoint, bytes_in=len(response.content), decode_time=time.time() - start_time)
+
+        if self._debug_capture == CISCO_TA_DEBUG_CAPTURE_ON_FAILURE and phantom.is_fail(ret_val[0]):
+            self._add_response_debug_data(response, action_result)
+
+        return ret_val
+
+    def _process_response_content(self, response, action_result):
+        """ This function is used to process the response according to its content type.
+
+        :param response: response data
+        :param action_result: object of Action Result
+        :return: status phantom.APP_ERROR/phantom.APP_SUCCESS(along with appropriate message)
+        """
+
+        # Process each 'Content-Type' of response separately
+        # Process a json response
+        if 'json' in response.headers.get('Content-Type', ''):
+            return self._process_json_response(response, action_result)
+
+        # Process an HTML response, Do this no matter what the API talks.
+        # There is a high chance of a PROXY in between phantom and the rest of
+        # world, in case of errors, PROXY's return HTML, this function parses
+        # the error and adds it to the action_result.
+        if 'html' in response.headers.get('Content-Type', ''):
+            return self._process_html_response(response, action_result)
+
+        if 'text' in response.headers.get('Content-Type', ''):
+            return self._process_text_response(response, action_result)
+
+        # it's not content-type that is to be parsed, handle an empty response
+        if not response.text:
+            return self._process_empty_response(response, action_result)
+
+        # everything else is actually an error at this point
+        message = "Can't process response from server. Status Code: {0} Data from server: {1}".\
+            format(response.status_code, response.text.replace('{', '{{').replace('}', '}}'))
+
+        return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+
+    def _list_endpoints(self, param):
+        """ This action is used to list endpoints.
+
+        :param param: dictionary of param
+        :return: status success/failure
+        """
+
+        action_result = self.add_action_result(ActionResult(dict(param)))
+        summary_data = action_result.update_summary({})
+
+        # Querying endpoint to generate access token
+        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_SENSORS_ENDPOINT, action_result=action_result, method='get',
+                                                result_handler=action_result.add_data)
+
+        # Something went wrong
+        if phantom.is_fail(status):
+            return action_result.get_status()
+
+        # Refresh the sensor inventory with the freshly fetched sensors
+        self._save_sensor_inventory(action_result.get_data())
+
+        # Update summary
+        summary_data["total_endpoints"] = action_result.get_data_size()
+
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _flowsearch(self, json_body, action_result, cache=False):
+        """ This is a helper function used to send a single flowsearch request. The response is streamed so that the
+        flows are decoded while they are received, without holding the raw body in memory. Only the searches that a
+        user may run again are cached, the windows of on poll and the IPs of lookup ip are rarely searched twice.
+
+        :param json_body: flowsearch request body
+        :param action_result: object of ActionResult class
+        :param cache: whether the response is read from and written to the flowsearch cache
+        :return: status success/failure, response data
+        """
+
+        cache_path, expires_at = self._get_flowsearch_cache_entry(json_body) if cache else (None, None)
+
+        if cache_path:
+            response = self._read_flowsearch_cache(cache_path)
+            if response is not None:
+                return RetVal(phantom.APP_SUCCESS, response)
+
+        flows = []
+        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_FLOWSEARCH_ENDPOINT, action_result=action_result,
+                                                json_body=json_body, method='post', result_handler=flows.append)
+
+        # Something went wrong
+        if phantom.is_fail(status):
+            return RetVal(action_result.get_status(), None)
+
+        response['results'] = flows
+
+        if cache_path:
+            self._write_flowsearch_cache(cache_path, expires_at, response)
+
+        return RetVal(phantom.APP_SUCCESS, response)
+
+    def _get_flowsearch_cache_entry(self, json_body):
+        """ This is a helper function that returns the path of the cache file of a flowsearch request and its expiry
+        time. The file is named after the SHA-256 of the request body with its times normalized to epoch seconds and its
+        keys sorted. A window that ended long enough ago for all its flows to be ingested never expires, a window that
+        touches now expires after the configured TTL and is not cached if the TTL is 0.
+
+        :param json_body: flowsearch request body
+        :return: path of the cache file and expiry time in epoch seconds, None if it never expires, or (None, None) if
+        the request is not cached
+        """
+
+        if not self._flowsearch_cache_dir:
+            return None, None
+
+        normalized_body = dict(json_body)
+        for key in ('t0', 't1'):
+            epoch = self._parse_time(json_body[key]) if key in json_body else None
+            if epoch is not None:
+                normalized_body[key] = epoch
+
+        now = int(time.time())
+        end_time = normalized_body.get('t1')
+
+        if isinstance(end_time, int) and end_time <= now - CISCO_TA_FLOWSEARCH_CLOSED_WINDOW_DELAY:
+            expires_at = None
+        elif self._flowsearch_cache_ttl:
+            expires_at = now + self._flowsearch_cache_ttl
+        else:
+            return None, None
+
+        key = hashlib.sha256(json.dumps(normalized_body, sort_keys=True, separators=(',', ':'))).hexdigest()
+
+        return os.path.join(self._flowsearch_cache_dir, key + '.json'), expires_at
+
+    def _read_flowsearch_cache(self, cache_path):
+        """ This is a helper function that returns the cached flowsearch response of a cache file. An expired file is
+        removed, the modification time of a hit is refreshed as it orders the eviction.
+
+        :param cache_path: path of the cache file
+        :return: flowsearch response or None if it is not cached
+        """
+
+        try:
+            with open(cache_path) as cache_file:
+                entry = json.load(cache_file)
+
+            if entry['expires_at'] is not None and entry['expires_at'] <= time.time():
+                os.remove(cache_path)
+                return None
+
+            os.utime(cache_path, None)
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+        return entry['response']
+
+    def _write_flowsearch_cache(self, cache_path, expires_at, response):
+        """ This is a helper function that writes a flowsearch response to its cache file, then evicts the least
+        recently used files until the cache fits in the configured size. A failure to write the cache is only logged.
+
+        :param cache_path: path of the cache file
+        :param expires_at: expiry time in epoch seconds, None if it never expires
+        :param response: flowsearch response
+        """
+
+        try:
+            self._write_json_file(cache_path, {'expires_at': expires_at, 'response': response})
+            self._evict_flowsearch_cache()
+        except (IOError, OSError) as e:
+            self.debug_print(CISCO_TA_FLOWSEARCH_CACHE_WRITE_ERROR, e)
+
+    def _evict_flowsearch_cache(self):
+        """ This is a helper function that removes the least recently used cache files until the total size of the
+        cache is below the configured size.
+        """
+
+        entries = []
+        total_size = 0
+
+        for file_name in os.listdir(self._flowsearch_cache_dir):
+            try:
+                file_stat = os.stat(os.path.join(self._flowsearch_cache_dir, file_name))
+            except OSError:
+                # Removed by a concurrent eviction
+                continue
+
+            entries.append((file_stat.st_mtime, file_stat.st_size, file_name))
+            total_size += file_stat.st_size
+
+        if total_size <= self._flowsearch_cache_size:
+            return
+
+        for _, size, file_name in sorted(entries):
+            try:
+                os.remove(os.path.join(self._flowsearch_cache_dir, file_name))
+            except OSError:
+                continue
+
+            total_size -= size
+            if total_size <= self._flowsearch_cache_size:
+                break
+
+    def _fetch_flow_page(self, json_body, action_result, cache):
+        """ This is a helper function used to fetch one flowsearch page in a worker thread.
+
+        :param json_body: flowsearch request body
+        :param action_result: object of ActionResult class
+        :param cache: whether the page is read from and written to the flowsearch cache
+        :return: status success/failure, response data, fetch time in seconds
+        """
+
+        start_time = time.time()
+        status, response = self._flowsearch(json_body, action_result, cache=cache)
+
+        return status, response, time.time() - start_time
+
+    def _send_flow_page(self, json_body, remaining, action_result, cache=False):
+        """ This is a helper function that sends the request of one flowsearch page to the worker pool, a page holds at
+        most the page size or the remaining number of flows.
+
+        :param json_body: flowsearch request body
+        :param remaining: number of flows left to fetch
+        :param action_result: object of ActionResult class
+        :param cache: whether the page is read from and written to the flowsearch cache
+        :return: pending request of the page
+        """
+
+        page_body = dict(json_body, limit=min(remaining, CISCO_TA_FLOWSEARCH_PAGE_SIZE))
+
+        return self._get_worker_pool().apply_async(self._fetch_flow_page, (page_body, action_result, cache))
+
+    def _paginate_flowsearch(self, json_body, limit, action_result, pending=None, cache=False):
+        """ This is a generator that follows the offset continuation token returned by flowsearch until limit flows
+        are fetched or no more flows are available. The request of the next page is sent to the worker pool before the
+        current page is handed over to the caller, so that it is fetched while the current page is being processed.
+
+        :param json_body: flowsearch request body
+        :param limit: maximum number of flows to fetch
+        :param action_result: object of ActionResult class
+        :param pending: request of the first page already sent to the worker pool by the caller, if any
+        :param cache: whether the pages are read from and written to the flowsearch cache
+        :return: yields status success/failure, (list of flows of the page, page fetch time in seconds)
+        """
+
+        remaining = limit
+
+        if not pending:
+            pending = self._send_flow_page(json_body, remaining, action_result, cache=cache)
+
+        while pending:
+            status, response, fetch_time = pending.get()
+            pending = None
+
+            # Something went wrong
+            if phantom.is_fail(status):
+                yield RetVal(action_result.get_status(), None)
+                return
+
+            flows = (response.get("results") or [])[:remaining]
+            remaining -= len(flows)
+            offset = response.get("offset")
+
+            # Request the next page while the current one is being processed
+            if offset and flows and remaining > 0:
+                pending = self._send_flow_page(dict(json_body, offset=offset), remaining, action_result, cache=cache)
+
+            yield RetVal(phantom.APP_SUCCESS, (flows, fetch_time))
+
+    def _get_sensor_inventory(self, action_result):
+        """ This is a helper function that returns the sensor inventory from its cache file if it is younger than the
+        configured TTL, else it fetches all the sensors and refreshes the inventory.
+
+        :param action_result: object of ActionResult class
+        :return: status success/failure, sensor inventory
+        """
+
+        inventory = None
+
+        if self._sensor_cache_ttl:
+            try:
+                with open(self._sensor_inventory_path) as inventory_file:
+                    inventory = json.load(inventory_file)
+            except (IOError, ValueError):
+                inventory = None
+
+        if inventory and time.time() - inventory.get('fetched_at', 0) < self._sensor_cache_ttl:
+            return RetVal(phantom.APP_SUCCESS, inventory)
+
+        sensors = []
+        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_SENSORS_ENDPOINT, action_result=action_result,
+                                                result_handler=sensors.append)
+
+        # Something went wrong
+        if phantom.is_fail(status):
+            return RetVal(action_result.get_status(), None)
+
+        return RetVal(phantom.APP_SUCCESS, self._save_sensor_inventory(sensors))
+
+    def _save_sensor_inventory(self, sensors):
+        """ This is a helper function that builds the sensor inventory along with an index that maps every interface IP
+        to the positions of its sensors, and saves it in its cache file when caching is enabled. A failure to write the
+        cache file is only logged.
+
+        :param sensors: list of sensors
+        :return: sensor inventory
+        """
+
+        ip_index = {}
+        for position, sensor in enumerate(sensors):
+            for interface in sensor.get('interfaces') or []:
+                positions = ip_index.setdefault(interface.get(CISCO_TA_JSON_IP), [])
+                # A sensor is added only once for an IP even if multiple interfaces have it
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+
+        inventory = {'fetched_at': time.time(), 'sensors': sensors, 'ip_index': ip_index}
+
+        try:
+            if self._sensor_cache_ttl:
+                self._write_json_file(self._sensor_inventory_path, inventory)
+            elif os.path.exists(self._sensor_inventory_path):
+                os.remove(self._sensor_inventory_path)
+        except (IOError, OSError) as e:
+            self.debug_print(CISCO_TA_SENSOR_INVENTORY_WRITE_ERROR, e)
+
+        return inventory
+
+    def _get_flowsearch_catalog(self, catalog, action_result):
+        """ This is a helper function that returns the list of dimensions or metrics of flowsearch from the asset state
+        if it is younger than the configured TTL, else it fetches the list and refreshes the cached catalog.
+
+        :param catalog: 'dimensions' or 'metrics'
+        :param action_result: object of ActionResult class
+        :return: status success/failure, list of dimensions or metrics
+        """
+
+        cached_catalogs = self._state.get(CISCO_TA_STATE_FLOWSEARCH_CATALOG) or {}
+        cached_catalog = cached_catalogs.get(catalog)
+
+        if cached_catalog and time.time() - cached_catalog.get('fetched_at', 0) < self._catalog_cache_ttl:
+            return RetVal(phantom.APP_SUCCESS, cached_catalog['values'])
+
+        status, response = self._make_rest_call(endpoint=CISCO_TA_FLOWSEARCH_CATALOG_ENDPOINTS[catalog],
+                                                action_result=action_result, method='get')
+
+        # Something went wrong
+        if phantom.is_fail(status):
+            return RetVal(action_result.get_status(), None)
+
+        if self._catalog_cache_ttl:
+            self._set_state(CISCO_TA_STATE_FLOWSEARCH_CATALOG, {'fetched_at': time.time(), 'values': response},
+                            subkey=catalog)
+
+        return RetVal(phantom.APP_SUCCESS, response)
+
+    def _normalize_catalog_values(self, catalog, values, action_result):
+        """ This is a helper function that checks the given dimensions or metrics against the cached catalog and
+        normalizes their case and duplicates. The check is skipped when the catalog cache is disabled, as it would cost
+        an extra round trip.
+
+        :param catalog: 'dimensions' or 'metrics'
+        :param values: list of dimensions or metrics
+        :param action_result: object of ActionResult class
+        :return: status success/failure, list of normalized dimensions or metrics
+        """
+
+        if not self._catalog_cache_ttl:
+            return RetVal(phantom.APP_SUCCESS, values)
+
+        status, catalog_values = self._get_flowsearch_catalog(catalog, action_result)
+
+        # Something went wrong
+        if phantom.is_fail(status):
+            return RetVal(action_result.get_status(), None)
+
+        catalog_index = dict((catalog_value.lower(), catalog_value) for catalog_value in catalog_values)
+        invalid_values = [value for value in values if value.lower() not in catalog_index]
+
+        if invalid_values:
+            message = CISCO_TA_INVALID_CATALOG_VALUES.format(catalog=catalog, values=', '.join(invalid_values))
+            self.debug_print(message)
+            return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+
+        normalized_values = list(OrderedDict.fromkeys(catalog_index[value.lower()] for value in values))
+
+        return RetVal(phantom.APP_SUCCESS, normalized_values)
+
+    def _get_ip_flowsearch_bodies(self, ip_list, chunk_size=CISCO_TA_LOOKUP_IP_CHUNK_SIZE):
+        """ This is a helper function used to prepare the flowsearch requests for the flows of the last day of a list of
+        IPs. IPs are searched in chunks, with one flowsearch per chunk that matches any IP of the chunk as source or
+        destination address.
+
+        :param ip_list: list of IPs
+        :param chunk_size: number of IPs per flowsearch
+        :return: list of (IP chunk, flowsearch request body)
+        """
+
+        t1 = int(mktime(datetime.now().timetuple()))
+        json_bodies = []
+
+        for index in range(0, len(ip_list), chunk_size):
+            ip_chunk = ip_list[index:index + chunk_size]
+
+            json_body = {
+                "t0": t1 - 86400,
+                "t1": t1,
+                'limit': CISCO_TA_LOOKUP_IP_FLOW_LIMIT * len(ip_chunk)
+            }
+
+            filter_dict = {'type': 'or', 'filters': []}
+
+            for ip in ip_chunk:
+                filter_dict['filters'].append({'type': 'eq', 'field': 'src_address', 'value': ip})
+                filter_dict['filters'].append({'type': 'eq', 'field': 'dst_address', 'value': ip})
+
+            json_body['filter'] = filter_dict
+            json_bodies.append((ip_chunk, json_body))
+
+        return json_bodies
+
+    def _get_truncated_chunk_ips(self, json_bodies, responses, flows_by_ip):
+        """ This is a helper function that returns the IPs which may be missing flows because the flowsearch of their
+        chunk was truncated. A full response may have been filled by the busiest IPs of the chunk, so the IPs of the
+        chunk with less than the flow limit of an IP are returned.
+
+        :param json_bodies: list of (IP chunk, flowsearch request body)
+        :param responses: list of flowsearch responses, in the order of the request bodies
+        :param flows_by_ip: dictionary of flows per IP
+        :return: list of IPs
+        """
+
+        truncated_ips = []
+
+        for (ip_chunk, json_body), response in zip(json_bodies, responses):
+            if len(ip_chunk) < 2:
+                continue
+
+            if len(response.get('results') or []) < json_body['limit'] and not response.get('offset'):
+                continue
+
+            truncated_ips.extend(ip for ip in ip_chunk if len(flows_by_ip[ip]) < CISCO_TA_LOOKUP_IP_FLOW_LIMIT)
+
+        return truncated_ips
+
+    def _split_flows_by_ip(self, ip_list, responses):
+        """ This is a helper function used to split the flows found by the flowsearch requests back per IP.
+
+        :param ip_list: list of IPs
+        :param responses: list of flowsearch responses
+        :return: dictionary of flows per IP
+        """
+
+        flows_by_ip = dict((ip, []) for ip in ip_list)
+
+        # A flow between two searched IPs belongs to both
+        for response in responses:
+            for flow in response.get('results') or []:
+                for ip in set([flow.get('src_address'), flow.get('dst_address')]):
+                    ip_flows = flows_by_ip.get(ip)
+                    if ip_flows is not None and len(ip_flows) < CISCO_TA_LOOKUP_IP_FLOW_LIMIT:
+                        ip_flows.append(flow)
+
+        return flows_by_ip
+
+    def _get_flows(self, param):
+        """ This action is used to get flow.
+
+        :param param: dictionary of param
+        :return: status success/failure
+        """
+
+        action_result = self.add_action_result(ActionResult(dict(param)))
+        summary_data = action_result.update_summary({})
+
+        # Get required parameter
+        start_time = (param[CISCO_TA_JSON_START_TIME]).upper()
+        end_time = (param[CISCO_TA_JSON_END_TIME]).upper()
+
+        limit = param.get(CISCO_TA_JSON_LIMIT, "100")
+        if not str(limit).isdigit() or int(limit) == 0:
+            self.debug_print(CISCO_TA_LIMIT_ERROR)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_LIMIT_ERROR)
+
+        limit = int(limit)
+
+        # Get optional parameter
+        query_filter = param.get(CISCO_TA_JSON_FILTER, {})
+        dimension = param.get(CISCO_TA_JSON_DIMENSIONS)
+        metrics = param.get(CISCO_TA_JSON_METRICS)
+        scope_name = param.get(CISCO_TA_JSON_SCOPE_NAME)
+        paginate = param.get(CISCO_TA_JSON_PAGINATE, False)
+        shard_minutes = param.get(CISCO_TA_JSON_SHARD_MINUTES)
+        output_format = param.get(CISCO_TA_JSON_OUTPUT_FORMAT, CISCO_TA_OUTPUT_FORMAT_ROWS)
+        deduplicate = param.get(CISCO_TA_JSON_DEDUPLICATE, False)
+
+        if output_format not in CISCO_TA_OUTPUT_FORMAT_LIST:
+            self.debug_print(CISCO_TA_OUTPUT_FORMAT_ERROR)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_OUTPUT_FORMAT_ERROR)
+
+        if shard_minutes is not None and (not str(shard_minutes).isdigit() or int(shard_minutes) == 0):
+            self.debug_print(CISCO_TA_SHARD_MINUTES_ERROR)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_SHARD_MINUTES_ERROR)
+
+        json_body = dict(t0=start_time, t1=end_time, limit=limit)
+
+        try:
+            if query_filter:
+                query_filter = json.loads(query_filter)
+        except Exception as e:
+            self.debug_print(CISCO_TA_JSON_LOADS_ERROR, e)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_JSON_LOADS_ERROR)
+
+        json_body[CISCO_TA_JSON_FILTER] = query_filter
+        # Get optional parameter
+        if scope_name:
+            status, scope_name = self._resolve_scope_name(scope_name, action_result)
+
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            json_body["scopeName"] = scope_name
+
+        if dimension:
+            dimension = dimension.replace(" ", "").split(",")
+
+            # if empty string in list, remove
+            dimension = [item for item in dimension if item]
+
+            # Validate the dimensions against the cached catalog before sending the request
+            status, dimension = self._normalize_catalog_values(CISCO_TA_JSON_DIMENSIONS, dimension, action_result)
+
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            json_body[CISCO_TA_JSON_DIMENSIONS] = dimension
+
+        if metrics:
+            metrics = metrics.replace(" ", "").split(",")
+
+            # if empty string in list, remove
+            metrics = [item for item in metrics if item]
+
+            # Validate the metrics against the cached catalog before sending the request
+            status, metrics = self._normalize_catalog_values(CISCO_TA_JSON_METRICS, metrics, action_result)
+
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            json_body[CISCO_TA_JSON_METRICS] = metrics
+
+        # The columnar output is added as a single data item once all the flows have been fetched
+        flow_columns = None
+        flow_export = None
+        flow_handler = action_result.add_data
+
+        if output_format == CISCO_TA_OUTPUT_FORMAT_COLUMNAR:
+            flow_columns = FlowColumns()
+            flow_handler = flow_columns.add
+        elif output_format in CISCO_TA_EXPORT_FILE_EXTENSIONS:
+            try:
+                flow_export = FlowExport(output_format, Vault.get_vault_tmp_dir())
+            except Exception as e:
+                self.debug_print(CISCO_TA_EXPORT_FILE_ERROR, e)
+                return action_result.set_status(phantom.APP_ERROR, CISCO_TA_EXPORT_FILE_ERROR)
+
+            flow_handler = flow_export.add
+
+        deduplicator = self._get_flow_deduplicator() if deduplicate else None
+        if deduplicator:
+            flow_handler = deduplicator.wrap(flow_handler)
+
+        # An export is always fetched page by page so that it is streamed into its file
+        if shard_minutes:
+            status = self._get_sharded_flows(json_body, int(shard_minutes) * 60, limit, action_result, flow_handler)
+        elif paginate or flow_export:
+            status = self._get_paginated_flows(json_body, limit, action_result, flow_handler)
+        else:
+            # Querying endpoint to generate access token
+            status, response = self._flowsearch(json_body, action_result, cache=True)
+            flows = (response or {}).get("results") or []
+
+            for item in flows:
+                flow_handler(item)
+
+            # Update summary
+            summary_data["total_flows"] = len(flows)
+
+        if flow_export:
+            if not phantom.is_fail(status):
+                status = self._add_flow_export_to_vault(flow_export, action_result)
+
+            flow_export.remove()
+
+        # Something went wrong
+        if phantom.is_fail(status):
+            return action_result.get_status()
+
+        if flow_columns:
+            action_result.add_data(flow_columns.get_data())
+
+        # The flows counted by the search include the suppressed ones
+        if deduplicator:
+            summary_data["total_flows"] = deduplicator.total_emitted
+            self._save_flow_deduplicator(deduplicator, action_result)
+
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _add_flow_export_to_vault(self, flow_export, action_result):
+        """ This function is used to add the file of an export to the vault of the container, the vault ID, the number of
+        flows and the size of the file are added as the data of the action result.
+
+        :param flow_export: object of FlowExport class
+        :param action_result: object of ActionResult class
+        :return: status success/failure
+        """
+
+        try:
+            flow_export.close()
+            file_size = os.path.getsize(flow_export.file_path)
+            vault_info = Vault.add_attachment(flow_export.file_path, self.get_container_id(),
+                                              file_name=flow_export.file_name)
+        except Exception as e:
+            self.debug_print(CISCO_TA_EXPORT_FILE_ERROR, e)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_EXPORT_FILE_ERROR)
+
+        if not vault_info.get('succeeded'):
+            message = CISCO_TA_VAULT_ADD_ERROR.format(message=vault_info.get('message'))
+            self.debug_print(message)
+            return action_result.set_status(phantom.APP_ERROR, message)
+
+        action_result.add_data({
+            CISCO_TA_JSON_VAULT_ID: vault_info.get(CISCO_TA_JSON_VAULT_ID), 'file_name': flow_export.file_name,
+            'total_rows': flow_export.total_rows, 'file_size': file_size
+        })
+        action_result.update_summary({CISCO_TA_JSON_VAULT_ID: vault_info.get(CISCO_TA_JSON_VAULT_ID),
+                                      'file_size': file_size})
+
+        return phantom.APP_SUCCESS
+
+    def _on_poll(self, param):
+        """ This action is used to ingest the flows of the configured scope and filter. Each poll fetches, page by page,
+        only the flows since the end of the window of the previous poll, which is kept in the state, and saves them as
+        artifacts of containers holding a batch of flows each.
+
+        :param param: dictionary of param
+        :return: status success/failure
+        """
+
+        action_result = self.add_action_result(ActionResult(dict(param)))
+        summary_data = action_result.update_summary({})
+        config = self.get_config()
+
+        scope_name = config.get(CISCO_TA_CONFIG_POLL_SCOPE_NAME)
+        query_filter = config.get(CISCO_TA_CONFIG_POLL_FILTER)
+        lookback_minutes = config.get(CISCO_TA_CONFIG_POLL_LOOKBACK_MINUTES, CISCO_TA_DEFAULT_POLL_LOOKBACK_MINUTES)
+        flows_per_container = config.get(CISCO_TA_CONFIG_POLL_FLOWS_PER_CONTAINER,
+                                         CISCO_TA_DEFAULT_POLL_FLOWS_PER_CONTAINER)
+
+        if not str(lookback_minutes).isdigit() or int(lookback_minutes) == 0:
+            self.debug_print(CISCO_TA_POLL_LOOKBACK_MINUTES_ERROR)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_POLL_LOOKBACK_MINUTES_ERROR)
+
+        if not str(flows_per_container).isdigit() or int(flows_per_container) == 0:
+            self.debug_print(CISCO_TA_POLL_FLOWS_PER_CONTAINER_ERROR)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_POLL_FLOWS_PER_CONTAINER_ERROR)
+
+        flows_per_container = int(flows_per_container)
+
+        try:
+            query_filter = json.loads(query_filter) if query_filter else {}
+        except Exception as e:
+            self.debug_print(CISCO_TA_JSON_LOADS_ERROR, e)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_JSON_LOADS_ERROR)
+
+        json_body = dict(filter=query_filter)
+
+        if scope_name:
+            status, scope_name = self._resolve_scope_name(scope_name, action_result)
+
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            json_body["scopeName"] = scope_name
+
+        # The watermark is the end of the window of the previous poll of the same scope and filter. The window ends
+        # before now by the time the cluster takes to ingest all the flows of a window, so that no late flow is skipped
+        watermark_key = json.dumps([scope_name, query_filter], sort_keys=True)
+        watermarks = self._state.get(CISCO_TA_STATE_POLL_WATERMARKS) or {}
+        end_time = int(time.time()) - CISCO_TA_FLOWSEARCH_CLOSED_WINDOW_DELAY
+        start_time = watermarks.get(watermark_key, end_time - int(lookback_minutes) * 60)
+
+        # The flows of the second of the watermark already ingested by the previous poll are skipped
+        boundary_fingerprints = set((self._state.get(CISCO_TA_STATE_POLL_BOUNDARY_FINGERPRINTS) or {}).get(
+            watermark_key) or [])
+
+        if start_time >= end_time:
+            summary_data["total_flows"] = 0
+            summary_data["total_containers"] = 0
+            return action_result.set_status(phantom.APP_SUCCESS)
+
+        # Poll now ingests a sample of the window and does not move the watermark
+        limit = CISCO_TA_POLL_MAX_FLOWS
+        if self.is_poll_now():
+            limit = int(param.get(phantom.APP_JSON_ARTIFACT_COUNT) or CISCO_TA_DEFAULT_POLL_NOW_FLOWS)
+
+        json_body.update(t0=start_time, t1=end_time)
+        total_fetched = 0
+        total_flows = 0
+        total_containers = 0
+        last_flow_time = None
+        last_second_fingerprints = set()
+
+        for status, page in self._paginate_flowsearch(json_body, limit, action_result):
+
+            # Something went wrong
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            flows, _ = page
+            total_fetched += len(flows)
+            new_flows = []
+
+            for flow in flows:
+                fingerprint = FlowDeduplicator.get_fingerprint(flow)
+                flow_time = self._parse_time(flow.get('timestamp') or '')
+
+                # The fingerprints of the flows of the latest second are kept, whatever the order of the flows
+                if flow_time is not None and (last_flow_time is None or flow_time >= last_flow_time):
+                    if flow_time != last_flow_time:
+                        last_flow_time = flow_time
+                        last_second_fingerprints = set()
+                    last_second_fingerprints.add(fingerprint)
+
+                if fingerprint not in boundary_fingerprints:
+                    new_flows.append(flow)
+
+            flows = new_flows
+
+            for index in range(0, len(flows), flows_per_container):
+                status = self._save_flow_container(flows[index:index + flows_per_container], watermark_key, start_time,
+                                                   end_time, total_containers, action_result)
+
+                if phantom.is_fail(status):
+                    return action_result.get_status()
+
+                total_containers += 1
+
+            total_flows += len(flows)
+
+        if not self.is_poll_now():
+            # A poll truncated by the flow limit resumes from the second of its latest flow, whose flows already
+            # ingested are skipped by the next poll. The rest of the window is ingested next.
+            if total_fetched >= limit:
+                if last_flow_time is not None and last_flow_time > start_time:
+                    end_time = last_flow_time
+                else:
+                    # The watermark always moves forward, so that a second holding more than the limit does not stall
+                    # polls, the rest of the flows of that second is dropped
+                    self.debug_print(CISCO_TA_POLL_TRUNCATED_WINDOW.format(time=start_time))
+                    end_time = start_time + 1
+
+            if last_flow_time != end_time:
+                last_second_fingerprints = set()
+
+            self._set_state(CISCO_TA_STATE_POLL_WATERMARKS, end_time, subkey=watermark_key)
+            self._set_state(CISCO_TA_STATE_POLL_BOUNDARY_FINGERPRINTS, sorted(last_second_fingerprints),
+                            subkey=watermark_key)
+
+        # Update summary
+        summary_data["total_flows"] = total_flows
+        summary_data["total_containers"] = total_containers
+
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _save_flow_container(self, flows, watermark_key, start_time, end_time, index, action_result):
+        """ This function is used to save a container holding a batch of polled flows as artifacts, in a single call.
+
+        :param flows: list of flows
+        :param watermark_key: key of the polled scope and filter
+        :param start_time: start of the polled window in epoch
+        :param end_time: end of the polled window in epoch
+        :param index: index of the container in the polled window
+        :param action_result: object of ActionResult class
+        :return: status success/failure
+        """
+
+        window = "{0} to {1}".format(datetime.utcfromtimestamp(start_time).isoformat() + 'Z',
+                                     datetime.utcfromtimestamp(end_time).isoformat() + 'Z')
+
+        artifacts = []
+        for flow in flows:
+            cef = dict(flow)
+            for flow_key, cef_key in CISCO_TA_FLOW_CEF_MAPPING.iteritems():
+                if flow.get(flow_key) is not None:
+                    cef[cef_key] = flow[flow_key]
+
+            artifacts.append({
+                'name': CISCO_TA_FLOW_ARTIFACT_NAME, 'label': CISCO_TA_FLOW_ARTIFACT_LABEL, 'cef': cef,
+                'source_data_identifier': hashlib.sha1(json.dumps(flow, sort_keys=True)).hexdigest(),
+                'run_automation': False
+            })
+
+        # Automation runs once per container, on its last artifact
+        artifacts[-1]['run_automation'] = True
+
+        container = {
+            'name': CISCO_TA_FLOW_CONTAINER_NAME.format(window=window, part=index + 1),
+            'description': CISCO_TA_FLOW_CONTAINER_DESCRIPTION.format(total_flows=len(flows)),
+            # The identifier only depends on the flows, so that a poll rerun after a failure updates its containers
+            'source_data_identifier': hashlib.sha1("{0}:{1}:{2}".format(
+                watermark_key, artifacts[0]['source_data_identifier'],
+                artifacts[-1]['source_data_identifier'])).hexdigest(),
+            'artifacts': artifacts
+        }
+
+        status, message, container_id = self.save_container(container)
+
+        if phantom.is_fail(status):
+            self.debug_print(message)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_SAVE_CONTAINER_ERROR.format(message=message))
+
+        return phantom.APP_SUCCESS
+
+    def _get_top_flows(self, param):
+        """ This action is used to get the top N values of a dimension by the total of a metric over the flows. The
+        aggregation is done by the cluster, if it fails the flows are fetched page by page and aggregated locally.
+
+        :param param: dictionary of param
+        :return: status success/failure
+        """
+
+        action_result = self.add_action_result(ActionResult(dict(param)))
+        summary_data = action_result.update_summary({})
+
+        # Get required parameter
+        start_time = (param[CISCO_TA_JSON_START_TIME]).upper()
+        end_time = (param[CISCO_TA_JSON_END_TIME]).upper()
+
+        threshold = param.get(CISCO_TA_JSON_THRESHOLD, CISCO_TA_DEFAULT_TOP_FLOWS_THRESHOLD)
+        if not str(threshold).isdigit() or int(threshold) == 0:
+            self.debug_print(CISCO_TA_THRESHOLD_ERROR)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_THRESHOLD_ERROR)
+
+        threshold = int(threshold)
+
+        # Validate the dimension and the metric against the cached catalog before sending the request
+        status, dimension = self._normalize_catalog_values(CISCO_TA_JSON_DIMENSIONS,
+                                                           [param[CISCO_TA_JSON_DIMENSION].strip()], action_result)
+
+        if phantom.is_fail(status):
+            return action_result.get_status()
+
+        status, metric = self._normalize_catalog_values(CISCO_TA_JSON_METRICS, [param[CISCO_TA_JSON_METRIC].strip()],
+                                                        action_result)
+
+        if phantom.is_fail(status):
+            return action_result.get_status()
+
+        dimension = dimension[0]
+        metric = metric[0]
+
+        # Get optional parameter
+        query_filter = param.get(CISCO_TA_JSON_FILTER, {})
+        scope_name = param.get(CISCO_TA_JSON_SCOPE_NAME)
+
+        try:
+            if query_filter:
+                query_filter = json.loads(query_filter)
+        except Exception as e:
+            self.debug_print(CISCO_TA_JSON_LOADS_ERROR, e)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_JSON_LOADS_ERROR)
+
+        json_body = dict(t0=start_time, t1=end_time, filter=query_filter)
+
+        if scope_name:
+            status, scope_name = self._resolve_scope_name(scope_name, action_result)
+
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            json_body["scopeName"] = scope_name
+
+        response_info = {}
+        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_FLOWSEARCH_TOPN_ENDPOINT,
+                                                action_result=action_result, method='post',
+                                                json_body=dict(json_body, dimension=dimension, metric=metric,
+                                                               threshold=threshold), response_info=response_info)
+
+        # The flows are aggregated locally only if the cluster does not support the top N search or failed to run it
+        # after the retries, any other error, such as an invalid filter or credentials, would fail the fallback too
+        status_code = response_info.get('status_code') or 0
+        if phantom.is_fail(status) and (status_code in CISCO_TA_TOPN_UNSUPPORTED_STATUS_CODES or status_code >= 500):
+            self.debug_print(CISCO_TA_TOPN_FALLBACK.format(message=action_result.get_message()))
+
+            status, top_flows = self._aggregate_top_flows(json_body, dimension, metric, threshold, action_result)
+
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            summary_data["aggregation"] = CISCO_TA_AGGREGATION_CLIENT
+        elif phantom.is_fail(status):
+            return action_result.get_status()
+        else:
+            # The result of the top N search is a list holding one object with the top N items
+            if isinstance(response, dict):
+                response = [response]
+
+            top_flows = [(item.get(dimension), item.get(metric)) for result in (response or [])
+                         for item in result.get("result", [])]
+            summary_data["aggregation"] = CISCO_TA_AGGREGATION_SERVER
+
+        for value, total in top_flows:
+            action_result.add_data({"value": value, "total": total})
+
+        # Update summary
+        summary_data["total_values"] = action_result.get_data_size()
+
+        if summary_data.get("truncated"):
+            return action_result.set_status(phantom.APP_SUCCESS, CISCO_TA_TOP_FLOWS_TRUNCATED.format(
+                max_flows=CISCO_TA_TOP_FLOWS_MAX_FLOWS))
+
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _aggregate_top_flows(self, json_body, dimension, metric, threshold, action_result):
+        """ This function is used to get the top N values of a dimension by fetching the flows page by page, fetching
+        only the dimension and the metric, and summing the metric of each value while the pages are read.
+
+        :param json_body: flowsearch request body
+        :param dimension: dimension to group the flows by
+        :param metric: metric to sum
+        :param threshold: number of values to return
+        :param action_result: object of ActionResult class
+        :return: status success/failure, list of (value, total) tuples in descending order of total
+        """
+
+        json_body = dict(json_body, dimensions=[dimension], metrics=[metric])
+        totals = {}
+        total_flows = 0
 
-        # Process each 'Content-Type' of response separately
-        # Process a json response
-        if 'json' in response.headers.get('Content-Type', ''):
-            return self._process_json_response(response, action_result)
+        for status, page in self._paginate_flowsearch(json_body, CISCO_TA_TOP_FLOWS_MAX_FLOWS, action_result,
+                                                      cache=True):
 
-        # Process an HTML response, Do this no matter what the API talks.
-        # There is a high chance of a PROXY in between phantom and the rest of
-        # world, in case of errors, PROXY's return HTML, this function parses
-        # the error and adds it to the action_result.
-        if 'html' in response.headers.get('Content-Type', ''):
-            return self._process_html_response(response, action_result)
+            # Something went wrong
+            if phantom.is_fail(status):
+                return RetVal(action_result.get_status(), None)
 
-        if 'text' in response.headers.get('Content-Type', ''):
-            return self._process_text_response(response, action_result)
+            flows, _ = page
+            total_flows += len(flows)
 
-        # it's not content-type that is to be parsed, handle an empty response
-        if not response.text:
-            return self._process_empty_response(response, action_result)
+            for flow in flows:
+                value = flow.get(dimension)
+                totals[value] = totals.get(value, 0) + (flow.get(metric) or 0)
 
-        # everything else is actually an error at this point
-        message = "Can't process response from server. Status Code: {0} Data from server: {1}".\
-            format(response.status_code, response.text.replace('{', '{{').replace('}', '}}'))
+        # The aggregation stops at the flow limit, the top values then only cover the flows fetched until then
+        action_result.update_summary({"total_flows": total_flows,
+                                      "truncated": total_flows >= CISCO_TA_TOP_FLOWS_MAX_FLOWS})
 
-        return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+        return RetVal(phantom.APP_SUCCESS, heapq.nlargest(threshold, totals.iteritems(), key=itemgetter(1)))
 
-    def _list_endpoints(self, param):
-        """ This action is used to list endpoints.
+    def _get_paginated_flows(self, json_body, limit, action_result, flow_handler):
+        """ This function is used to get flows page by page until limit is reached or no more flows are available.
 
-        :param param: dictionary of param
+        :param json_body: flowsearch request body
+        :param limit: maximum number of flows to fetch
+        :param action_result: object of ActionResult class
+        :param flow_handler: function called for each flow
         :return: status success/failure
         """
 
-        action_result = self.add_action_result(ActionResult(dict(param)))
         summary_data = action_result.update_summary({})
+        page_fetch_times = []
+        total_flows = 0
 
-        # Querying endpoint to generate access token
-        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_SENSORS_ENDPOINT, action_result=action_result, method='get')
+        for status, page in self._paginate_flowsearch(json_body, limit, action_result, cache=True):
 
-        # Something went wrong
-        if phantom.is_fail(status):
-            return action_result.get_status()
+            # Something went wrong
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            flows, fetch_time = page
+            page_fetch_times.append(round(fetch_time, 3))
+            total_flows += len(flows)
 
-        if response.get("results"):
-            for item in response.get("results", []):
-                action_result.add_data(item)
+            for item in flows:
+                flow_handler(item)
 
         # Update summary
-        summary_data["total_endpoints"] = action_result.get_data_size()
+        summary_data["total_flows"] = total_flows
+        summary_data["total_pages"] = len(page_fetch_times)
+        summary_data["page_fetch_times"] = page_fetch_times
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
-    def _search_flow(self, param):
-        """ This is a helper function used to search the flow.
+    def _get_sharded_flows(self, json_body, shard_seconds, limit, action_result, flow_handler):
+        """ This function is used to get flows by splitting the time range into consecutive windows which are searched
+        concurrently on the worker pool, one wave of windows at a time. The first pages of the windows of a wave are
+        fetched concurrently, the next pages of a window are fetched by following its offset like any paginated search.
+        After every wave, the window size is adapted to the density of the flows found so far. Flows are added in
+        timestamp order, earliest windows first, until limit is reached.
 
-        :param param: dictionary of input parameters
-        :return: response data
+        :param json_body: flowsearch request body
+        :param shard_seconds: initial size of a window in seconds
+        :param limit: maximum number of flows to fetch
+        :param action_result: object of ActionResult class
+        :param flow_handler: function called for each flow
+        :return: status success/failure
         """
 
-        action_result = ActionResult()
+        summary_data = action_result.update_summary({})
 
-        json_body = {
-            "t1": int(mktime(datetime.now().timetuple())),
-            'limit': 100
-        }
-        json_body['t0'] = json_body['t1'] - 86400
+        start_time = self._parse_time(json_body['t0'])
+        end_time = self._parse_time(json_body['t1'])
 
-        filter_dict = {'type': 'or', 'filters': []}
+        if start_time is None or end_time is None or start_time >= end_time:
+            self.debug_print(CISCO_TA_SHARD_TIME_RANGE_ERROR)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_SHARD_TIME_RANGE_ERROR)
 
-        for key, value in param.iteritems():
-            filter_dict['filters'].append({'type': 'eq', 'field': key, 'value': value})
+        window_start = start_time
+        remaining = limit
+        total_shards = 0
 
-        json_body['filter'] = filter_dict
+        while window_start < end_time and remaining > 0:
 
-        # Querying endpoint to generate access token
-        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_FLOWSEARCH_ENDPOINT, action_result=action_result, json_body=json_body, method='post')
+            # Prepare the next wave of windows, one per worker
+            windows = []
+            while len(windows) < self._max_workers and window_start < end_time:
+                window_end = min(window_start + shard_seconds, end_time)
+                windows.append((window_start, window_end))
+                window_start = window_end
 
-        # Something went wrong
-        if phantom.is_fail(status):
-            return action_result.set_status(phantom.APP_ERROR), None
+            shard_bodies = [dict(json_body, t0=t0, t1=t1) for t0, t1 in windows]
+            pending_shards = [self._send_flow_page(shard_body, remaining, action_result, cache=True)
+                              for shard_body in shard_bodies]
+            total_shards += len(windows)
+            wave_flows = 0
 
-        return action_result.set_status(phantom.APP_SUCCESS), response
+            # Results are consumed in window order so that the earliest flows are kept when limit is reached
+            for shard_body, pending in zip(shard_bodies, pending_shards):
+                flows = []
 
-    def _get_flows(self, param):
-        """ This action is used to get flow.
+                for status, page in self._paginate_flowsearch(shard_body, remaining, action_result, pending=pending,
+                                                              cache=True):
 
-        :param param: dictionary of param
-        :return: status success/failure
-        """
+                    # Something went wrong
+                    if phantom.is_fail(status):
+                        return action_result.get_status()
 
-        action_result = self.add_action_result(ActionResult(dict(param)))
-        summary_data = action_result.update_summary({})
+                    flows.extend(page[0])
 
-        # Get required parameter
-        start_time = (param[CISCO_TA_JSON_START_TIME]).upper()
-        end_time = (param[CISCO_TA_JSON_END_TIME]).upper()
+                flows.sort(key=self._get_flow_sort_key)
 
-        limit = param.get(CISCO_TA_JSON_LIMIT, "100")
-        if not str(limit).isdigit() or int(limit) == 0:
-            self.debug_print(CISCO_TA_LIMIT_ERROR)
-            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_LIMIT_ERROR)
+                for item in flows:
+                    flow_handler(item)
 
-        limit = int(limit)
+                remaining -= len(flows)
+                wave_flows += len(flows)
 
-        # Get optional parameter
-        query_filter = param.get(CISCO_TA_JSON_FILTER, {})
-        dimension = param.get(CISCO_TA_JSON_DIMENSIONS)
-        metrics = param.get(CISCO_TA_JSON_METRICS)
-        scope_name = param.get(CISCO_TA_JSON_SCOPE_NAME)
+                if remaining <= 0:
+                    break
 
-        json_body = dict(t0=start_time, t1=end_time, limit=limit)
+            # Size the next windows so that a wave is expected to return the remaining flows
+            wave_seconds = windows[-1][1] - windows[0][0]
+            if wave_flows:
+                target_flows = max(remaining // self._max_workers, 1)
+                shard_seconds = target_flows * wave_seconds // wave_flows
+            else:
+                shard_seconds *= 2
 
-        try:
-            if query_filter:
-                query_filter = json.loads(query_filter)
-        except Exception as e:
-            self.debug_print(CISCO_TA_JSON_LOADS_ERROR, e)
-            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_JSON_LOADS_ERROR)
+            shard_seconds = max(shard_seconds, CISCO_TA_MIN_SHARD_SECONDS)
 
-        json_body[CISCO_TA_JSON_FILTER] = query_filter
-        # Get optional parameter
-        if scope_name:
-            json_body["scopeName"] = scope_name
+        # Update summary
+        summary_data["total_flows"] = limit - remaining
+        summary_data["total_shards"] = total_shards
 
-        if dimension:
-            dimension = dimension.replace(" ", "").split(",")
+        return action_result.set_status(phantom.APP_SUCCESS)
 
-            # if empty string in list, remove
-            dimension = [item for item in dimension if item]
-            json_body[CISCO_TA_JSON_DIMENSIONS] = dimension
+    def _get_flow_deduplicator(self):
+        """ This is a helper function that returns a flow deduplicator loaded with the fingerprints of the flows emitted
+        by the previous runs of the asset.
 
-        if metrics:
-            metrics = metrics.replace(" ", "").split(",")
+        :return: object of FlowDeduplicator class
+        """
 
-            # if empty string in list, remove
-            metrics = [item for item in metrics if item]
-            json_body[CISCO_TA_JSON_METRICS] = metrics
+        return FlowDeduplicator(self._read_json_file(self._flow_fingerprints_path) or [], self._dedup_cache_size)
 
-        # Querying endpoint to generate access token
-        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_FLOWSEARCH_ENDPOINT, action_result=action_result, json_body=json_body, method='post')
+    def _save_flow_deduplicator(self, deduplicator, action_result):
+        """ This is a helper function that persists the fingerprints of the flow deduplicator in their file and reports
+        the number of suppressed flows in the summary. A failure to write the file is only logged.
 
-        # Something went wrong
-        if phantom.is_fail(status):
-            return action_result.get_status()
+        :param deduplicator: object of FlowDeduplicator class
+        :param action_result: object of ActionResult class
+        """
 
-        if response.get("results"):
-            for item in response.get("results", []):
-                action_result.add_data(item)
+        try:
+            self._write_json_file(self._flow_fingerprints_path, deduplicator.get_fingerprints())
+        except (IOError, OSError) as e:
+            self.debug_print(CISCO_TA_FLOW_FINGERPRINTS_WRITE_ERROR, e)
 
-        # Update summary
-        summary_data["total_flows"] = action_result.get_data_size()
+        action_result.update_summary({'total_suppressed': deduplicator.total_suppressed})
 
-        return action_result.set_status(phantom.APP_SUCCESS)
+    def _get_flow_sort_key(self, flow):
+        """ Function that returns the key used to sort the flows in timestamp order.
+
+        :param flow: flow dictionary
+        :return: sort key
+        """
+
+        return flow.get("timestamp") or "", flow.get("start_timestamp") or 0
 
     def _lookup_ip(self, param):
-        """ This function is used to lookup the IP.
+        """ This function is used to lookup one or more IPs, given as a comma separated list or in a vault file.
 
         :param param: dictionary of input parameters
         :return: status success/failure
@@ -435,38 +2344,109 @@ class CiscotaConnector(BaseConnector):
         action_result = self.add_action_result(ActionResult(dict(param)))
         summary_data = action_result.update_summary({})
 
-        ip = param[CISCO_TA_JSON_IP]
+        ip = param.get(CISCO_TA_JSON_IP)
+        vault_id = param.get(CISCO_TA_JSON_VAULT_ID)
+        deduplicate = param.get(CISCO_TA_JSON_DEDUPLICATE, False)
 
-        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_SENSORS_ENDPOINT, action_result=action_result)
+        if not (ip or vault_id):
+            self.debug_print(CISCO_TA_LOOKUP_IP_MISSING_PARAMETER)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_LOOKUP_IP_MISSING_PARAMETER)
 
-        if phantom.is_fail(status):
-            return action_result.get_status()
+        ip_list = self._get_ip_list(ip) if ip else []
 
-        endpoint_list = []
-        for result in response['results']:
-            for interface in result['interfaces']:
-                if interface[CISCO_TA_JSON_IP] == ip:
-                    # if IP is same, add into list
-                    endpoint_list.append(result)
-                    break
+        if vault_id:
+            status, vault_ip_list = self._get_vault_ip_list(vault_id, action_result)
 
-        flow_status, flow_response = self._search_flow(param={'src_address': ip, 'dst_address': ip})
+            if phantom.is_fail(status):
+                return action_result.get_status()
 
-        if phantom.is_fail(flow_status):
-            return action_result.get_status()
+            ip_list.extend(vault_ip_list)
 
-        # for endpoint in endpoint_list:
-        action_result.add_data({'endpoints': endpoint_list, 'flow': flow_response['results']})
+        # Remove duplicate IPs and keep the order in which they were given
+        ip_list = list(OrderedDict.fromkeys(ip_list))
 
-        summary_data['total_endpoints'] = len(endpoint_list)
+        # Fetch the sensor inventory and search the flows concurrently
+        calls = [(self._get_sensor_inventory, (action_result,))]
+        json_bodies = self._get_ip_flowsearch_bodies(ip_list)
+        calls.extend((self._flowsearch, (json_body, action_result)) for _, json_body in json_bodies)
 
-        if flow_response['results']:
-            summary_data['total_flows'] = len(flow_response['results'])
-        else:
-            summary_data['total_flows'] = 0
+        results = self._run_concurrently(calls)
+
+        for status, _ in results:
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+        inventory = results[0][1]
+        responses = [response for _, response in results[1:]]
+        flows_by_ip = self._split_flows_by_ip(ip_list, responses)
+
+        # The IPs of a truncated chunk which did not get all their flows are searched on their own
+        truncated_ips = self._get_truncated_chunk_ips(json_bodies, responses, flows_by_ip)
+
+        if truncated_ips:
+            json_bodies = self._get_ip_flowsearch_bodies(truncated_ips, chunk_size=1)
+            results = self._run_concurrently([(self._flowsearch, (json_body, action_result))
+                                              for _, json_body in json_bodies])
+
+            for status, _ in results:
+                if phantom.is_fail(status):
+                    return action_result.get_status()
+
+            flows_by_ip.update(self._split_flows_by_ip(truncated_ips, [response for _, response in results]))
+
+        deduplicator = self._get_flow_deduplicator() if deduplicate else None
+        if deduplicator:
+            for ip in ip_list:
+                flows_by_ip[ip] = [flow for flow in flows_by_ip[ip] if deduplicator.is_new(flow)]
+
+        sensors = inventory['sensors']
+        total_endpoints = 0
+        total_flows = 0
+
+        for ip in ip_list:
+            endpoint_list = [sensors[position] for position in inventory['ip_index'].get(ip, [])]
+            action_result.add_data({'ip': ip, 'endpoints': endpoint_list, 'flow': flows_by_ip[ip]})
+            total_endpoints += len(endpoint_list)
+            total_flows += len(flows_by_ip[ip])
+
+        summary_data['total_ips'] = len(ip_list)
+        summary_data['total_endpoints'] = total_endpoints
+        summary_data['total_flows'] = total_flows
+
+        if deduplicator:
+            self._save_flow_deduplicator(deduplicator, action_result)
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    def _get_vault_ip_list(self, vault_id, action_result):
+        """ This function is used to read a comma, space or newline separated list of IPs from a vault file.
+
+        :param vault_id: vault ID of the file
+        :param action_result: object of ActionResult class
+        :return: status success/failure, list of IPs
+        """
+
+        try:
+            file_path = Vault.get_file_path(vault_id)
+            with open(file_path) as vault_file:
+                ip_list = self._get_ip_list(vault_file.read())
+        except Exception as e:
+            self.debug_print(CISCO_TA_INVALID_VAULT_ID, e)
+            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_INVALID_VAULT_ID), None)
+
+        if not ip_list:
+            self.debug_print(CISCO_TA_EMPTY_VAULT_IPS)
+            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_EMPTY_VAULT_IPS), None)
+
+        invalid_ip_list = [ip for ip in ip_list if not self._is_ip(ip)]
+
+        if invalid_ip_list:
+            message = CISCO_TA_INVALID_VAULT_IPS.format(ips=', '.join(invalid_ip_list[:10]))
+            self.debug_print(message)
+            return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+
+        return RetVal(phantom.APP_SUCCESS, ip_list)
+
     def _list_user_groups(self, param):
         """ This action is used to list user groups.
 
@@ -477,28 +2457,25 @@ class CiscotaConnector(BaseConnector):
         action_result = self.add_action_result(ActionResult(dict(param)))
         summary_data = action_result.update_summary({})
 
-        # Get list of user roles
-        status, user_roles = self._make_rest_call(endpoint=CISCO_TA_REST_USER_ROLES_ENDPOINT, action_result=action_result)
+        # Get list of user roles and list of users concurrently
+        (status, user_roles), (users_status, users) = self._run_concurrently([
+            (self._make_rest_call, (CISCO_TA_REST_USER_ROLES_ENDPOINT, action_result)),
+            (self._make_rest_call, (CISCO_TA_REST_USER_ENDPOINT, action_result))
+        ])
 
         # Something went wrong
-        if phantom.is_fail(status):
+        if phantom.is_fail(status) or phantom.is_fail(users_status):
             return action_result.get_status()
 
-        # Get list of users
-        status, users = self._make_rest_call(endpoint=CISCO_TA_REST_USER_ENDPOINT, action_result=action_result)
-
-        # Something went wrong
-        if phantom.is_fail(status):
-            return action_result.get_status()
+        # Index the roles by their ID
+        roles_by_id = dict((role_dict['id'], role_dict) for role_dict in user_roles)
 
         # Iterate through all the users
         for user in users:
             for role_id in user.get('role_ids', []):
-                for role_dict in user_roles:
-                    if role_dict['id'] == role_id:
-                        users_of_roles = role_dict.get('users', [])
-                        users_of_roles.append(user)
-                        role_dict.update({'users': users_of_roles})
+                role_dict = roles_by_id.get(role_id)
+                if role_dict is not None:
+                    role_dict.setdefault('users', []).append(user)
 
         # Add the rules to action_result data
         for role_dict in user_roles:
@@ -543,7 +2520,10 @@ class CiscotaConnector(BaseConnector):
         action_result = self.add_action_result(ActionResult(dict(param)))
         summary_data = action_result.update_summary({})
 
-        scope_name = param[CISCO_TA_SCOPE_NAME]
+        status, scope_name = self._resolve_scope_name(param[CISCO_TA_SCOPE_NAME], action_result)
+
+        if phantom.is_fail(status):
+            return action_result.get_status()
 
         status, response = self._make_rest_call(endpoint=CISCO_TA_REST_LIST_ANNOTATIONS_ENDPOINT.format(scope_name=scope_name),
                                                 action_result=action_result, method='get')
@@ -569,7 +2549,11 @@ class CiscotaConnector(BaseConnector):
         """
 
         action_result = self.add_action_result(ActionResult(dict(param)))
-        scope_name = param[CISCO_TA_SCOPE_NAME]
+
+        status, scope_name = self._resolve_scope_name(param[CISCO_TA_SCOPE_NAME], action_result)
+
+        if phantom.is_fail(status):
+            return action_result.get_status()
 
         status, response = self._make_rest_call(endpoint=CISCO_TA_REST_LIST_ANNOTATIONS_ENDPOINT.format(scope_name=scope_name),
                 action_result=action_result, method='get')
@@ -598,13 +2582,23 @@ class CiscotaConnector(BaseConnector):
         action_result = self.add_action_result(ActionResult(dict(param)))
         summary_data = action_result.update_summary({})
 
-        scope_name = param[CISCO_TA_SCOPE_NAME]
+        status, scope_name = self._resolve_scope_name(param[CISCO_TA_SCOPE_NAME], action_result)
+
+        if phantom.is_fail(status):
+            return action_result.get_status()
 
         operation = param[CISCO_TA_JSON_OPERATION].lower()
 
         # Get optional parameter
         vault_id = param.get(CISCO_TA_JSON_VAULT_ID)
         filename = param.get(CISCO_TA_JSON_FILE_NAME)
+        batch_size = param.get(CISCO_TA_JSON_BATCH_SIZE, 0)
+
+        if not str(batch_size).isdigit():
+            self.debug_print(CISCO_TA_BATCH_SIZE_ERROR)
+            return action_result.set_status(phantom.APP_ERROR, CISCO_TA_BATCH_SIZE_ERROR)
+
+        batch_size = int(batch_size)
 
         # Validate vault_id and filename
         if not (vault_id or filename):
@@ -643,14 +2637,41 @@ class CiscotaConnector(BaseConnector):
         # Get file path using vault ID
         file_path = Vault.get_file_path(vault_id)
 
-        # Prepare payload
-        req_payload = [tetpyclient.MultiPartOption(key='X-Tetration-Oper', val=operation)]
+        endpoint = CISCO_TA_REST_UPLOAD_ANNOTATIONS_ENDPOINT.format(scope_name=scope_name)
 
-        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_UPLOAD_ANNOTATIONS_ENDPOINT.format(scope_name=scope_name),
-                action_result=action_result, method='upload', file_path=file_path, json_body=req_payload)
+        # A large file is split into batches of rows uploaded concurrently, a sync uploads only the changed rows
+        if batch_size or operation == CISCO_TA_OPERATION_SYNC:
+            with open(file_path, 'rb') as csv_file:
+                reader = csv.reader(csv_file)
+                header = next(reader, None)
 
-        if phantom.is_fail(status):
-            return action_result.get_status()
+                if not header:
+                    self.debug_print(CISCO_TA_INVALID_FILE_FORMAT)
+                    return action_result.set_status(phantom.APP_ERROR, CISCO_TA_INVALID_FILE_FORMAT)
+
+                if operation == CISCO_TA_OPERATION_SYNC:
+                    status, response = self._sync_annotation_rows(scope_name, endpoint, header, reader, batch_size,
+                                                                  action_result)
+                else:
+                    status, response = self._upload_annotation_rows(endpoint, operation, header, reader, batch_size,
+                                                                    action_result)
+
+            if phantom.is_fail(status):
+                return action_result.get_status()
+
+            # The counts of the upload go in the summary and the merged warnings in the data
+            warnings = response.pop('warnings')
+            summary_data.update(response)
+            response = {'warnings': warnings}
+        else:
+            # Prepare payload
+            req_payload = [tetpyclient.MultiPartOption(key='X-Tetration-Oper', val=operation)]
+
+            status, response = self._make_rest_call(endpoint=endpoint, action_result=action_result, method='upload',
+                                                    file_path=file_path, json_body=req_payload)
+
+            if phantom.is_fail(status):
+                return action_result.get_status()
 
         # Add data in action result
         action_result.add_data(response)
@@ -660,6 +2681,190 @@ class CiscotaConnector(BaseConnector):
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    def _upload_annotation_rows(self, endpoint, operation, header, rows, batch_size, action_result):
+        """ Function that uploads annotation rows in batches of the given size, each batch is written to a CSV file
+        with the header and the batches are uploaded concurrently on the worker pool. At most max_workers batches are
+        written ahead of the uploads, so the rows are streamed.
+
+        :param endpoint: REST endpoint of the upload
+        :param operation: add/delete
+        :param header: list of column names
+        :param rows: iterable of rows, each row is a list of column values
+        :param batch_size: number of rows per batch, all the rows are uploaded in one batch if 0
+        :param action_result: object of ActionResult class
+        :return: status success/failure, dictionary with the merged warnings and the number of batches
+        """
+
+        req_payload = [tetpyclient.MultiPartOption(key='X-Tetration-Oper', val=operation)]
+        worker_pool = self._get_worker_pool()
+        pending_uploads = deque()
+        warnings = []
+        total_batches = 0
+        status = phantom.APP_SUCCESS
+
+        batch_file = None
+        batch_rows = 0
+
+        for row in rows:
+            if not batch_file:
+                batch_file = tempfile.NamedTemporaryFile(dir=Vault.get_vault_tmp_dir(), suffix='.csv', delete=False)
+                writer = csv.writer(batch_file)
+                writer.writerow(header)
+
+            writer.writerow(row)
+            batch_rows += 1
+
+            if batch_rows < batch_size or not batch_size:
+                continue
+
+            batch_file.close()
+            pending_uploads.append(worker_pool.apply_async(self._upload_annotation_batch,
+                                                           (endpoint, batch_file.name, req_payload, action_result)))
+            total_batches += 1
+            batch_file = None
+            batch_rows = 0
+
+            # Wait for the oldest upload before writing more batches ahead
+            if len(pending_uploads) >= self._max_workers:
+                status, response = pending_uploads.popleft().get()
+                if phantom.is_fail(status):
+                    break
+                warnings.extend(response.get('warnings') or [])
+
+        if batch_file:
+            batch_file.close()
+            if phantom.is_fail(status):
+                os.remove(batch_file.name)
+            else:
+                pending_uploads.append(worker_pool.apply_async(self._upload_annotation_batch,
+                                                               (endpoint, batch_file.name, req_payload, action_result)))
+                total_batches += 1
+
+        # Wait for all the uploads, even after a failure, so that their batch files are removed
+        for pending in pending_uploads:
+            batch_status, response = pending.get()
+            if phantom.is_fail(batch_status):
+                status = batch_status
+            elif response:
+                warnings.extend(response.get('warnings') or [])
+
+        if phantom.is_fail(status):
+            return RetVal(action_result.get_status(), None)
+
+        return RetVal(phantom.APP_SUCCESS, {'warnings': warnings, 'total_batches': total_batches})
+
+    def _sync_annotation_rows(self, scope_name, endpoint, header, rows, batch_size, action_result):
+        """ Function that uploads the difference between the annotation rows and the rows of the previous sync of the
+        scope. Rows are identified by their IP and VRF columns and compared by the hash of their values, which is all
+        that is kept in the state. New and changed rows are added, rows that are not in the file anymore are deleted.
+
+        :param scope_name: name of the scope
+        :param endpoint: REST endpoint of the upload
+        :param header: list of column names
+        :param rows: iterable of rows, each row is a list of column values
+        :param batch_size: number of rows per batch, all the rows are uploaded in one batch if 0
+        :param action_result: object of ActionResult class
+        :return: status success/failure, dictionary with the merged warnings and the upload counts
+        """
+
+        columns = [column.strip().lower() for column in header]
+        key_columns = [columns.index(column) for column in CISCO_TA_ANNOTATION_KEY_COLUMNS if column in columns]
+
+        if CISCO_TA_JSON_IP not in columns:
+            self.debug_print(CISCO_TA_SYNC_IP_COLUMN_ERROR)
+            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_SYNC_IP_COLUMN_ERROR), None)
+
+        fingerprint_path = self._get_annotation_fingerprint_path(scope_name)
+        previous_fingerprint = self._read_json_file(fingerprint_path) or {}
+        header_hash = self._hash_annotation_row(header)
+
+        # Every row is changed when the columns are not the same as in the previous sync
+        previous_rows = previous_fingerprint.get('rows', {})
+        if previous_fingerprint.get('header') != header_hash:
+            previous_rows = {}
+
+        row_hashes = {}
+
+        def changed_rows():
+            for row in rows:
+                key = '\t'.join(row[index] for index in key_columns if index < len(row))
+                row_hash = self._hash_annotation_row(row)
+                row_hashes[key] = row_hash
+
+                if previous_rows.get(key) != row_hash:
+                    yield row
+
+        status, response = self._upload_annotation_rows(endpoint, CISCO_TA_OPERATION_ADD, header, changed_rows(),
+                                                        batch_size, action_result)
+
+        if phantom.is_fail(status):
+            return RetVal(action_result.get_status(), None)
+
+        total_added = sum(1 for key, row_hash in row_hashes.iteritems() if previous_rows.get(key) != row_hash)
+        total_batches = response['total_batches']
+        warnings = response['warnings']
+
+        # The rows that are not in the file anymore are deleted by their key columns
+        deleted_keys = [key for key in previous_fingerprint.get('rows', {}) if key not in row_hashes]
+
+        status, response = self._upload_annotation_rows(endpoint, CISCO_TA_OPERATION_DELETE,
+                                                        [header[index] for index in key_columns],
+                                                        (key.split('\t') for key in deleted_keys), batch_size,
+                                                        action_result)
+
+        if phantom.is_fail(status):
+            return RetVal(action_result.get_status(), None)
+
+        # The fingerprint is only replaced once the whole difference has been uploaded
+        try:
+            self._write_json_file(fingerprint_path, {'header': header_hash, 'rows': row_hashes})
+        except (IOError, OSError) as e:
+            self.debug_print(CISCO_TA_ANNOTATION_FINGERPRINT_WRITE_ERROR, e)
+            return RetVal(action_result.set_status(phantom.APP_ERROR, CISCO_TA_ANNOTATION_FINGERPRINT_WRITE_ERROR),
+                          None)
+
+        return RetVal(phantom.APP_SUCCESS, {
+            'warnings': warnings + response['warnings'], 'total_batches': total_batches + response['total_batches'],
+            'total_added': total_added, 'total_deleted': len(deleted_keys),
+            'total_unchanged': len(row_hashes) - total_added
+        })
+
+    def _get_annotation_fingerprint_path(self, scope_name):
+        """ Function that returns the path of the file holding the fingerprint of the previous sync of a scope. The
+        fingerprint holds a hash of every row and is too large to be loaded with the state by every action.
+
+        :param scope_name: name of the scope
+        :return: path of the file
+        """
+
+        return os.path.join(self.get_state_dir(), CISCO_TA_ANNOTATION_FINGERPRINT_FILE.format(
+            asset_id=self.get_asset_id(), scope_hash=hashlib.sha1(json.dumps(scope_name)).hexdigest()))
+
+    def _hash_annotation_row(self, row):
+        """ Function that returns a short hash of the values of an annotation row.
+
+        :param row: list of column values
+        :return: hexadecimal hash
+        """
+
+        return hashlib.sha1('\x1f'.join(row)).hexdigest()[:CISCO_TA_ANNOTATION_HASH_LENGTH]
+
+    def _upload_annotation_batch(self, endpoint, file_path, req_payload, action_result):
+        """ Function that uploads a batch file of annotations and removes it.
+
+        :param endpoint: REST endpoint of the upload
+        :param file_path: path of the batch file
+        :param req_payload: list of MultiPartOption objects
+        :param action_result: object of ActionResult class
+        :return: status success/failure, response obtained by making an API call
+        """
+
+        try:
+            return self._make_rest_call(endpoint=endpoint, action_result=action_result, method='upload',
+                                        file_path=file_path, json_body=req_payload)
+        finally:
+            os.remove(file_path)
+
     def _list_dimensions(self, param):
         """ This function is used to list all dimensions.
 
@@ -670,7 +2875,7 @@ class CiscotaConnector(BaseConnector):
         action_result = self.add_action_result(ActionResult(dict(param)))
         summary_data = action_result.update_summary({})
 
-        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_DIMENSIONS_ENDPOINT, action_result=action_result, method='get')
+        status, response = self._get_flowsearch_catalog(CISCO_TA_JSON_DIMENSIONS, action_result)
 
         if phantom.is_fail(status):
             return action_result.get_status()
@@ -693,7 +2898,7 @@ class CiscotaConnector(BaseConnector):
         action_result = self.add_action_result(ActionResult(dict(param)))
         summary_data = action_result.update_summary({})
 
-        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_METRICS_ENDPOINT, action_result=action_result, method='get')
+        status, response = self._get_flowsearch_catalog(CISCO_TA_JSON_METRICS, action_result)
 
         if phantom.is_fail(status):
             return action_result.get_status()
@@ -716,45 +2921,133 @@ class CiscotaConnector(BaseConnector):
         action_result = self.add_action_result(ActionResult(dict(param)))
         summary_data = action_result.update_summary({})
 
-        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_LIST_SCOPES_ENDPOINT, method='get', action_result=action_result)
+        status, catalog = self._get_scope_catalog(action_result)
 
         if phantom.is_fail(status):
             return action_result.get_status()
 
-        for scope in response:
-            # Change all the numeric values into string format as some fields may have both string and numeric value
-            scope = self._process_data(scope)
-            action_result.add_data(scope)
+        for scope_id in catalog['order']:
+            action_result.add_data(catalog['scopes'][scope_id])
 
         # Update Summary
         summary_data['total_scopes'] = action_result.get_data_size()
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    def _get_scope_catalog(self, action_result, force_refresh=False):
+        """ This is a helper function that returns the scope catalog from the asset state if it is younger than the
+        configured TTL, else it fetches all the scopes and refreshes the catalog. On refresh, only the scopes whose
+        updated_at changed since the previous refresh are normalized again.
+
+        :param action_result: object of ActionResult class
+        :param force_refresh: whether to refresh the catalog even if it is younger than the TTL
+        :return: status success/failure, scope catalog
+        """
+
+        catalog = self._state.get(CISCO_TA_STATE_SCOPE_CATALOG) or {}
+
+        if catalog and not force_refresh and time.time() - catalog.get('fetched_at', 0) < self._catalog_cache_ttl:
+            return RetVal(phantom.APP_SUCCESS, catalog)
+
+        status, response = self._make_rest_call(endpoint=CISCO_TA_REST_LIST_SCOPES_ENDPOINT, method='get', action_result=action_result)
+
+        # Something went wrong
+        if phantom.is_fail(status):
+            return RetVal(action_result.get_status(), None)
+
+        cached_scopes = catalog.get('scopes', {})
+        cached_updated_at = catalog.get('updated_at', {})
+        catalog = {'fetched_at': time.time(), 'order': [], 'scopes': {}, 'updated_at': {}, 'name_index': {}}
+
+        for scope in response:
+            scope_id = scope.get('id')
+            updated_at = scope.get('updated_at')
+
+            if scope_id in cached_scopes and updated_at is not None and cached_updated_at.get(scope_id) == updated_at:
+                scope = cached_scopes[scope_id]
+            else:
+                # Change all the numeric values into string format as some fields may have both string and numeric value
+                scope = self._process_data(scope)
+
+            catalog['order'].append(scope_id)
+            catalog['scopes'][scope_id] = scope
+            catalog['updated_at'][scope_id] = updated_at
+            catalog['name_index'][scope.get('name')] = scope_id
+
+        if self._catalog_cache_ttl:
+            self._set_state(CISCO_TA_STATE_SCOPE_CATALOG, catalog)
+
+        return RetVal(phantom.APP_SUCCESS, catalog)
+
+    def _resolve_scope_name(self, scope_name, action_result):
+        """ This is a helper function that checks the given scope name or ID against the scope catalog and returns the
+        full name of the scope. The catalog is refreshed once if the scope is not found, as it may have been created
+        since the last refresh. The check is skipped when the catalog cache is disabled.
+
+        :param scope_name: full name or ID of the scope
+        :param action_result: object of ActionResult class
+        :return: status success/failure, full name of the scope
+        """
+
+        if not self._catalog_cache_ttl:
+            return RetVal(phantom.APP_SUCCESS, scope_name)
+
+        for force_refresh in (False, True):
+            status, catalog = self._get_scope_catalog(action_result, force_refresh=force_refresh)
+
+            # Something went wrong
+            if phantom.is_fail(status):
+                return RetVal(action_result.get_status(), None)
+
+            scope_id = catalog['name_index'].get(scope_name)
+            if scope_id is None and scope_name in catalog['scopes']:
+                scope_id = scope_name
+
+            if scope_id is not None:
+                return RetVal(phantom.APP_SUCCESS, catalog['scopes'][scope_id].get('name'))
+
+        message = CISCO_TA_INVALID_SCOPE_NAME.format(scope_name=scope_name)
+        self.debug_print(message)
+
+        return RetVal(action_result.set_status(phantom.APP_ERROR, message), None)
+
     def _process_data(self, data):
-        """ This function is used to convert all numeric values of dictionaries into string.``
+        """ This function is used to convert all numeric values of JSON decoded dictionaries and lists into string.
+        Values are converted in place and nested dictionaries and lists are walked with an explicit stack, so deeply
+        nested scope queries neither recurse nor allocate per value.
 
-        :param scope_dict:
-        :return:
+        :param data: data to process
+        :return: processed data
         """
 
-        # If data is of boolean type, return
-        if isinstance(data, bool):
-            return data
+        # Exact type checks leave booleans as they are, bool is a subclass of int
+        data_type = type(data)
 
         # If data is int or float convert it into string
-        if isinstance(data, int) or isinstance(data, float):
-            data = str(data)
+        if data_type is int or data_type is float:
+            return str(data)
+
+        stack = [data]
+
+        while stack:
+            container = stack.pop()
+            container_type = type(container)
 
-        # If data is list, iterate through each item and call function recursively
-        if isinstance(data, list):
-            for index, item in enumerate(data):
-                data[index] = self._process_data(item)
+            if container_type is dict:
+                items = container.iteritems()
+            elif container_type is list:
+                items = enumerate(container)
+            else:
+                continue
+
+            # Replacing the value of an existing key or index does not invalidate the iterator
+            for key, value in items:
+                value_type = type(value)
 
-        # If data is dict, iterate through it and call function recursively for each value
-        if isinstance(data, dict):
-            for key, value in data.iteritems():
-                data[key] = self._process_data(value)
+                if value_type is int or value_type is float:
+                    container[key] = str(value)
+                elif value_type is dict or value_type is list:
+                    stack.append(value)
 
         return data
 
@@ -769,6 +3062,8 @@ class CiscotaConnector(BaseConnector):
         action_mapping = {
             'test_asset_connectivity': self._test_asset_connectivity,
             'get_flows': self._get_flows,
+            'get_top_flows': self._get_top_flows,
+            'on_poll': self._on_poll,
             'list_endpoints': self._list_endpoints,
             'list_scopes': self._list_scopes,
             'lookup_ip': self._lookup_ip,
@@ -783,10 +3078,35 @@ class CiscotaConnector(BaseConnector):
         action = self.get_action_identifier()
         action_execution_status = phantom.APP_SUCCESS
 
+        self._rest_stats = {}
+        total_action_results = len(self.get_action_results())
+
         if action in action_mapping.keys():
             action_function = action_mapping[action]
             action_execution_status = action_function(param)
 
+        # The number and time of the REST calls of every endpoint go in the summary, all the stats go in the debug data
+        # according to the debug capture policy
+        rest_stats = self._get_rest_stats(CISCO_TA_REST_STATS_SUMMARY_KEYS)
+        verbose_rest_stats = self._get_rest_stats()
+
+        for action_result in self.get_action_results()[total_action_results:]:
+            # The status message generated from the summary would hold the REST call stats, it is set from the other
+            # keys of the summary instead
+            if not action_result.get_message() and not phantom.is_fail(action_result.get_status()):
+                action_result.set_status(action_result.get_status(), self._get_summary_message(
+                    action_result.get_summary()))
+
+            if not rest_stats:
+                continue
+
+            action_result.update_summary({CISCO_TA_JSON_REST_STATS: rest_stats})
+
+            if self._debug_capture == CISCO_TA_DEBUG_CAPTURE_TRUNCATED or (
+                    self._debug_capture == CISCO_TA_DEBUG_CAPTURE_ON_FAILURE and
+                    phantom.is_fail(action_result.get_status())):
+                action_result.add_debug_data({CISCO_TA_JSON_REST_STATS: verbose_rest_stats})
+
         return action_execution_status
 
 
@@ -19,10 +19,76 @@ CISCO_TA_CONFIG_URL = "server_url"
 CISCO_TA_CONFIG_API_KEY = "api_key"
 CISCO_TA_CONFIG_API_SECRET = "api_secret"
 CISCO_TA_CONFIG_VERIFY_SSL = "verify_server_cert"
+CISCO_TA_CONFIG_POOL_SIZE = "pool_size"
+CISCO_TA_DEFAULT_POOL_SIZE = 10
+CISCO_TA_CONFIG_MAX_WORKERS = "max_workers"
+CISCO_TA_DEFAULT_MAX_WORKERS = 4
+CISCO_TA_CONFIG_SENSOR_CACHE_TTL = "sensor_cache_ttl"
+CISCO_TA_DEFAULT_SENSOR_CACHE_TTL = 15
+CISCO_TA_STATE_SENSOR_INVENTORY = "sensor_inventory"
+CISCO_TA_SENSOR_INVENTORY_FILE = "{asset_id}_sensor_inventory.json"
+CISCO_TA_CONFIG_CATALOG_CACHE_TTL = "catalog_cache_ttl"
+CISCO_TA_DEFAULT_CATALOG_CACHE_TTL = 1440
+CISCO_TA_STATE_FLOWSEARCH_CATALOG = "flowsearch_catalog"
+CISCO_TA_STATE_SCOPE_CATALOG = "scope_catalog"
+CISCO_TA_CONFIG_RETRY_COUNT = "retry_count"
+CISCO_TA_DEFAULT_RETRY_COUNT = 3
+CISCO_TA_RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+CISCO_TA_RETRY_BACKOFF_FACTOR = 1
+CISCO_TA_MAX_RETRY_DELAY = 60
+CISCO_TA_CONFIG_MAX_REQUESTS_PER_SECOND = "max_requests_per_second"
+CISCO_TA_DEFAULT_MAX_REQUESTS_PER_SECOND = 20
+CISCO_TA_MIN_REQUESTS_PER_SECOND = 0.5
+CISCO_TA_RATE_LIMIT_INCREASE = 0.1
+CISCO_TA_STATE_REQUESTS_PER_SECOND = "requests_per_second"
+CISCO_TA_JSON_REST_STATS = "rest_stats"
+CISCO_TA_REST_STATS_KEYS = ["requests", "bytes_out", "bytes_in", "ttfb", "latency", "decode_time"]
+CISCO_TA_REST_STATS_SUMMARY_KEYS = ["requests", "latency"]
+CISCO_TA_CONFIG_POLL_SCOPE_NAME = "poll_scope_name"
+CISCO_TA_CONFIG_POLL_FILTER = "poll_filter"
+CISCO_TA_CONFIG_POLL_LOOKBACK_MINUTES = "poll_lookback_minutes"
+CISCO_TA_DEFAULT_POLL_LOOKBACK_MINUTES = 60
+CISCO_TA_CONFIG_POLL_FLOWS_PER_CONTAINER = "poll_flows_per_container"
+CISCO_TA_DEFAULT_POLL_FLOWS_PER_CONTAINER = 100
+CISCO_TA_DEFAULT_POLL_NOW_FLOWS = 100
+CISCO_TA_POLL_MAX_FLOWS = 1000000
+CISCO_TA_STATE_POLL_WATERMARKS = "poll_watermarks"
+CISCO_TA_STATE_POLL_BOUNDARY_FINGERPRINTS = "poll_boundary_fingerprints"
+CISCO_TA_FLOW_CONTAINER_NAME = "Cisco Tetration flows from {window} ({part})"
+CISCO_TA_FLOW_CONTAINER_DESCRIPTION = "{total_flows} flow(s) ingested from Cisco Tetration Analytics"
+CISCO_TA_FLOW_ARTIFACT_NAME = "Flow"
+CISCO_TA_FLOW_ARTIFACT_LABEL = "flow"
+CISCO_TA_FLOW_CEF_MAPPING = {
+    "src_address": "sourceAddress", "dst_address": "destinationAddress", "src_port": "sourcePort",
+    "dst_port": "destinationPort", "proto": "transportProtocol", "src_hostname": "sourceHostName",
+    "dst_hostname": "destinationHostName"
+}
+CISCO_TA_CONFIG_DEDUP_CACHE_SIZE = "dedup_cache_size"
+CISCO_TA_DEFAULT_DEDUP_CACHE_SIZE = 100000
+CISCO_TA_STATE_FLOW_FINGERPRINTS = "flow_fingerprints"
+CISCO_TA_FLOW_FINGERPRINTS_FILE = "{asset_id}_flow_fingerprints.json"
+CISCO_TA_FLOW_FINGERPRINT_KEYS = ["src_address", "dst_address", "src_port", "dst_port", "proto", "start_timestamp"]
+CISCO_TA_FLOW_FINGERPRINT_LENGTH = 16
+CISCO_TA_CONFIG_FLOWSEARCH_CACHE_SIZE = "flowsearch_cache_size"
+CISCO_TA_DEFAULT_FLOWSEARCH_CACHE_SIZE = 100
+CISCO_TA_CONFIG_FLOWSEARCH_CACHE_TTL = "flowsearch_cache_ttl"
+CISCO_TA_DEFAULT_FLOWSEARCH_CACHE_TTL = 1
+CISCO_TA_FLOWSEARCH_CACHE_DIR = "flowsearch_cache"
+CISCO_TA_FLOWSEARCH_CLOSED_WINDOW_DELAY = 600
+CISCO_TA_CONFIG_DEBUG_CAPTURE = "debug_capture"
+CISCO_TA_CONFIG_DEBUG_CAPTURE_BYTES = "debug_capture_bytes"
+CISCO_TA_DEBUG_CAPTURE_OFF = "Off"
+CISCO_TA_DEBUG_CAPTURE_TRUNCATED = "Truncated"
+CISCO_TA_DEBUG_CAPTURE_ON_FAILURE = "On failure"
+CISCO_TA_DEBUG_CAPTURE_LIST = [CISCO_TA_DEBUG_CAPTURE_OFF, CISCO_TA_DEBUG_CAPTURE_TRUNCATED,
+                               CISCO_TA_DEBUG_CAPTURE_ON_FAILURE]
+CISCO_TA_DEFAULT_DEBUG_CAPTURE_BYTES = 4096
 CISCO_TA_CONNECTION_TEST_MSG = "Querying endpoint to verify the credentials provided"
 CISCO_TA_REST_DIMENSIONS_ENDPOINT = "/openapi/v1/flowsearch/dimensions"
 CISCO_TA_REST_METRICS_ENDPOINT = "/openapi/v1/flowsearch/metrics"
 CISCO_TA_REST_FLOWSEARCH_ENDPOINT = "/openapi/v1/flowsearch"
+CISCO_TA_REST_FLOWSEARCH_TOPN_ENDPOINT = "/openapi/v1/flowsearch/topn"
+CISCO_TA_TOPN_UNSUPPORTED_STATUS_CODES = [404, 501]
 CISCO_TA_REST_LIST_SCOPES_ENDPOINT = "/openapi/v1/app_scopes"
 CISCO_TA_REST_SENSORS_ENDPOINT = "/openapi/v1/sensors"
 CISCO_TA_REST_LIST_ANNOTATIONS_ENDPOINT = "/openapi/v1/assets/cmdb/annotations/{scope_name}"
@@ -41,13 +107,53 @@ CISCO_TA_JSON_FILTER = "filter"
 CISCO_TA_JSON_SCOPE_NAME = "scope_name"
 CISCO_TA_JSON_DIMENSIONS = "dimensions"
 CISCO_TA_JSON_METRICS = "metrics"
+CISCO_TA_FLOWSEARCH_CATALOG_ENDPOINTS = {
+    CISCO_TA_JSON_DIMENSIONS: CISCO_TA_REST_DIMENSIONS_ENDPOINT,
+    CISCO_TA_JSON_METRICS: CISCO_TA_REST_METRICS_ENDPOINT
+}
+CISCO_TA_JSON_DIMENSION = "dimension"
+CISCO_TA_JSON_METRIC = "metric"
+CISCO_TA_JSON_THRESHOLD = "threshold"
+CISCO_TA_DEFAULT_TOP_FLOWS_THRESHOLD = 10
+CISCO_TA_TOP_FLOWS_MAX_FLOWS = 1000000
+CISCO_TA_AGGREGATION_SERVER = "server"
+CISCO_TA_AGGREGATION_CLIENT = "client"
 CISCO_TA_JSON_LIMIT = "limit"
+CISCO_TA_JSON_PAGINATE = "paginate"
+CISCO_TA_FLOWSEARCH_PAGE_SIZE = 1000
+CISCO_TA_STREAM_CHUNK_SIZE = 65536
+CISCO_TA_JSON_SHARD_MINUTES = "shard_minutes"
+CISCO_TA_JSON_OUTPUT_FORMAT = "output_format"
+CISCO_TA_OUTPUT_FORMAT_ROWS = "Rows"
+CISCO_TA_OUTPUT_FORMAT_COLUMNAR = "Columnar"
+CISCO_TA_OUTPUT_FORMAT_VAULT_NDJSON = "Vault NDJSON"
+CISCO_TA_OUTPUT_FORMAT_VAULT_CSV = "Vault CSV"
+CISCO_TA_OUTPUT_FORMAT_LIST = [CISCO_TA_OUTPUT_FORMAT_ROWS, CISCO_TA_OUTPUT_FORMAT_COLUMNAR,
+                               CISCO_TA_OUTPUT_FORMAT_VAULT_NDJSON, CISCO_TA_OUTPUT_FORMAT_VAULT_CSV]
+CISCO_TA_EXPORT_FILE_EXTENSIONS = {
+    CISCO_TA_OUTPUT_FORMAT_VAULT_NDJSON: "ndjson.gz", CISCO_TA_OUTPUT_FORMAT_VAULT_CSV: "csv.gz"
+}
+CISCO_TA_EXPORT_FILE_NAME = "cisco_ta_flows_{timestamp}.{extension}"
+CISCO_TA_JSON_DEDUPLICATE = "deduplicate"
+CISCO_TA_MIN_SHARD_SECONDS = 60
+CISCO_TA_ISO_8601_REGEX = r"^(?P<datetime>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(\.\d+)?" \
+                          r"(Z|(?P<sign>[+-])(?P<hours>\d{2}):?(?P<minutes>\d{2}))?$"
 CISCO_TA_JSON_LOADS_ERROR = "Error while converting string to dictionary"
 CISCO_TA_LIMIT_ERROR = "Parameter limit must be a positive integer"
 CISCO_TA_JSON_VAULT_ID = "vault_id"
 CISCO_TA_JSON_FILE_NAME = "filename"
 CISCO_TA_JSON_OPERATION = "operation"
+CISCO_TA_JSON_BATCH_SIZE = "batch_size"
+CISCO_TA_OPERATION_ADD = "add"
+CISCO_TA_OPERATION_DELETE = "delete"
+CISCO_TA_OPERATION_SYNC = "sync"
+CISCO_TA_ANNOTATION_KEY_COLUMNS = ["ip", "vrf"]
+CISCO_TA_ANNOTATION_HASH_LENGTH = 16
+CISCO_TA_STATE_ANNOTATION_FINGERPRINTS = "annotation_fingerprints"
+CISCO_TA_ANNOTATION_FINGERPRINT_FILE = "{asset_id}_annotation_fingerprint_{scope_hash}.json"
 CISCO_TA_JSON_IP = "ip"
+CISCO_TA_LOOKUP_IP_CHUNK_SIZE = 50
+CISCO_TA_LOOKUP_IP_FLOW_LIMIT = 100
 CISCO_TA_SCOPE_NAME = "scope_name"
 CISCO_TA_MISSING_PARAMETER = "At least one of the Vault ID or File name must be specified"
 CISCO_TA_INVALID_VAULT_ID = "Invalid Vault ID"
@@ -55,4 +161,43 @@ CISCO_TA_INVALID_FILE_NAME = "Invalid file name"
 CISCO_TA_INVALID_FILE_FORMAT = "Invalid file format"
 CISCO_TA_NO_ANNOTATIONS_FOUND = "No annotations found to flush"
 CISCO_TA_ANNOTATIONS_FLUSHED = "Annotations flushed successfully"
+CISCO_TA_TOP_FLOWS_TRUNCATED = "The aggregation stopped at {max_flows} flows, the top values only cover them"
+CISCO_TA_ACTION_SUCCESS_MSG = "Action completed successfully"
 CISCO_TA_ERROR_CONNECTING_SERVER = "Error while connecting to server"
+CISCO_TA_POOL_SIZE_ERROR = "Connection pool size must be a positive integer"
+CISCO_TA_CONNECTION_POOL_STATS = "Connection pool stats: {requests} request(s) over {connections} connection(s), " \
+                                 "{reused} request(s) reused a kept-alive connection"
+CISCO_TA_MAX_WORKERS_ERROR = "Maximum number of workers must be a positive integer"
+CISCO_TA_SHARD_MINUTES_ERROR = "Parameter shard_minutes must be a positive integer"
+CISCO_TA_SHARD_TIME_RANGE_ERROR = "Parameters start_time and end_time must be a valid epoch or ISO 8601 time range " \
+                                  "to shard the flow search"
+CISCO_TA_SENSOR_CACHE_TTL_ERROR = "Sensor cache TTL must be a non-negative integer"
+CISCO_TA_LOOKUP_IP_MISSING_PARAMETER = "At least one of the IP or Vault ID must be specified"
+CISCO_TA_INVALID_VAULT_IPS = "Invalid IP(s) in vault file: {ips}"
+CISCO_TA_EMPTY_VAULT_IPS = "The vault file does not contain any IP"
+CISCO_TA_DEBUG_CAPTURE_ERROR = "Debug capture must be one of: {0}".format(", ".join(CISCO_TA_DEBUG_CAPTURE_LIST))
+CISCO_TA_DEBUG_CAPTURE_BYTES_ERROR = "Debug capture bytes must be a non-negative integer"
+CISCO_TA_CATALOG_CACHE_TTL_ERROR = "Catalog cache TTL must be a non-negative integer"
+CISCO_TA_INVALID_CATALOG_VALUES = "Invalid {catalog}: {values}"
+CISCO_TA_INVALID_SCOPE_NAME = "Scope {scope_name} not found"
+CISCO_TA_BATCH_SIZE_ERROR = "Parameter batch_size must be a non-negative integer"
+CISCO_TA_SYNC_IP_COLUMN_ERROR = "The file must have an IP column to sync annotations"
+CISCO_TA_ANNOTATION_FINGERPRINT_WRITE_ERROR = "Error while saving the fingerprint of the synced annotations"
+CISCO_TA_OUTPUT_FORMAT_ERROR = "Parameter output_format must be one of: {0}".format(", ".join(CISCO_TA_OUTPUT_FORMAT_LIST))
+CISCO_TA_FLOWSEARCH_CACHE_SIZE_ERROR = "Flowsearch cache size must be a non-negative integer"
+CISCO_TA_FLOWSEARCH_CACHE_TTL_ERROR = "Flowsearch cache TTL must be a non-negative integer"
+CISCO_TA_SENSOR_INVENTORY_WRITE_ERROR = "Error while writing the sensor inventory cache"
+CISCO_TA_FLOW_FINGERPRINTS_WRITE_ERROR = "Error while saving the fingerprints of the emitted flows"
+CISCO_TA_FLOWSEARCH_CACHE_WRITE_ERROR = "Error while writing the flowsearch cache"
+CISCO_TA_EXPORT_FILE_ERROR = "Error while writing the export file"
+CISCO_TA_VAULT_ADD_ERROR = "Error while adding the export file to the vault. Details: {message}"
+CISCO_TA_DEDUP_CACHE_SIZE_ERROR = "Dedup cache size must be a non-negative integer"
+CISCO_TA_POLL_LOOKBACK_MINUTES_ERROR = "Poll lookback minutes must be a positive integer"
+CISCO_TA_POLL_FLOWS_PER_CONTAINER_ERROR = "Poll flows per container must be a positive integer"
+CISCO_TA_POLL_TRUNCATED_WINDOW = "The poll flow limit was reached within the second {time}, its other flows are dropped"
+CISCO_TA_SAVE_CONTAINER_ERROR = "Error while saving the container. Details: {message}"
+CISCO_TA_THRESHOLD_ERROR = "Parameter threshold must be a positive integer"
+CISCO_TA_TOPN_FALLBACK = "Top N flow search failed, aggregating the flows locally. Error: {message}"
+CISCO_TA_RETRY_COUNT_ERROR = "Retry count must be a non-negative integer"
+CISCO_TA_MAX_REQUESTS_PER_SECOND_ERROR = "Maximum requests per second must be a non-negative number"
+CISCO_TA_RETRYING_REQUEST = "Retrying {endpoint} after {delay:.2f} seconds. Reason: {reason}"
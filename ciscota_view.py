@@ -15,14 +15,179 @@
 #
 #
 # of Phantom Cyber Corporation.
+import re
 import time
+import urllib
 
+FLOW_TIME_FORMAT = '%b %d %I:%M:%S %p'
+FLOW_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+FLOW_TIMESTAMP_FRACTION_REGEX = re.compile(r'\.\d{1,6}Z$')
 
-def _get_ctx_result(provides, result):
+# Number of rows rendered per page of the paginated views, the rows of the other pages are not put in the context. A
+# lookup ip page holds that many flows, whatever the number of IPs they belong to
+PAGE_SIZES = {"get flows": 100, "lookup ip": 100}
+# Query string parameter of the page of a result, each result of the view is paginated on its own
+PAGE_PARAMETER = "page_{index}"
+
+
+class ColumnarRows(object):
+    """ This class is the sequence of the flows of a get flows result in the columnar output format. A flow is built
+    from the columns only when it is accessed, so rendering a page builds only the flows of the page.
+    """
+
+    def __init__(self, data):
+
+        self.schema = data['schema']
+        self._columns = data['columns']
+        self._total_rows = data['total_rows']
+
+    def __len__(self):
+        return self._total_rows
+
+    def __iter__(self):
+        for index in xrange(self._total_rows):
+            yield self._row(index)
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return [self._row(row_index) for row_index in xrange(*index.indices(self._total_rows))]
+
+        if index < 0:
+            index += self._total_rows
+
+        if not 0 <= index < self._total_rows:
+            raise IndexError(index)
+
+        return self._row(index)
+
+    def _row(self, index):
+        """ Function that builds a flow, the keys the flow does not have are None in their column.
+
+        :param index: index of the flow
+        :return: flow dictionary
+        """
+
+        row = {}
+
+        for key, column in zip(self.schema, self._columns):
+            value = column[index]
+            if value is not None:
+                row[key] = value
+
+        return row
+
+
+def _get_page(context, index):
+    """ Function that returns the page of a result requested in the query string of the view.
+
+    :param context: context
+    :param index: index of the result in the view
+    :return: page number, starting at 1
+    """
+
+    page = context.get('QS', {}).get(PAGE_PARAMETER.format(index=index), 1)
+
+    if isinstance(page, list):
+        page = page[0] if page else 1
+
+    if not str(page).isdigit() or int(page) == 0:
+        return 1
+
+    return int(page)
+
+
+def _get_page_url(context, index, page):
+    """ Function that returns the URL of a page of a result, the other parameters of the query string of the view are
+    kept as they are.
+
+    :param context: context
+    :param index: index of the result in the view
+    :param page: page number
+    :return: relative URL of the page
+    """
+
+    page_parameter = PAGE_PARAMETER.format(index=index)
+    query = [(key, value) for key, value in sorted(context.get('QS', {}).items()) if key != page_parameter]
+    query.append((page_parameter, page))
+
+    return '?' + urllib.urlencode(query, doseq=True)
+
+
+def _paginate(data, page, page_size):
+    """ Function that returns the rows of a page and the paging information.
+
+    :param data: list of rows
+    :param page: page number, starting at 1, the last page is returned if it is greater than the number of pages
+    :param page_size: number of rows per page
+    :return: list of rows of the page, dictionary of paging information
+    """
+
+    total_rows = len(data)
+    total_pages = max((total_rows + page_size - 1) // page_size, 1)
+    page = min(page, total_pages)
+    start = (page - 1) * page_size
+    rows = data[start:start + page_size]
+
+    return rows, {
+        'page': page, 'total_pages': total_pages, 'total_rows': total_rows, 'first_row': start + 1,
+        'last_row': start + len(rows), 'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if page < total_pages else None
+    }
+
+
+def _paginate_ip_flows(data, page, page_size):
+    """ Function that returns the IPs of a page of lookup ip results and the paging information. A page holds at most
+    page_size flows, an IP without flows takes the place of one flow, so that the flows of an IP may be split over
+    consecutive pages. The IPs of the page only hold their flows of the page.
+
+    :param data: list of IP results
+    :param page: page number, starting at 1, the last page is returned if it is greater than the number of pages
+    :param page_size: number of flows per page
+    :return: list of IP results of the page, dictionary of paging information
+    """
+
+    offsets = []
+    total_rows = 0
+    for ip_data in data:
+        offsets.append(total_rows)
+        total_rows += max(len(ip_data.get('flow') or []), 1)
+
+    total_pages = max((total_rows + page_size - 1) // page_size, 1)
+    page = min(page, total_pages)
+    start = (page - 1) * page_size
+    end = start + page_size
+
+    rows = []
+    first_ip = last_ip = 0
+    for position, ip_data in enumerate(data):
+        flows = ip_data.get('flow') or []
+        if offsets[position] + max(len(flows), 1) <= start:
+            continue
+        if offsets[position] >= end:
+            break
+
+        first_flow = max(start - offsets[position], 0)
+        last_flow = min(end - offsets[position], len(flows))
+        rows.append(dict(ip_data, flow=flows[first_flow:last_flow], flow_paging={
+            'first_row': first_flow + 1, 'last_row': last_flow, 'total_rows': len(flows)}))
+
+        first_ip = first_ip or position + 1
+        last_ip = position + 1
+
+    return rows, {
+        'page': page, 'total_pages': total_pages, 'total_rows': len(data), 'first_row': first_ip,
+        'last_row': last_ip, 'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if page < total_pages else None
+    }
+
+
+def _get_ctx_result(provides, result, page=1):
     """ Function that parse data.
 
     :param provides: action name
     :param result: result
+    :param page: page of the rows to render, for the paginated views
     :return: context response
     """
 
@@ -41,23 +206,53 @@ def _get_ctx_result(provides, result):
         return ctx_result
 
     ctx_result['action'] = provides
-    ctx_result['data'] = _parse_data(data, provides)
+
+    # A get flows result exported to the vault is a single data item describing the file, there are no flows to render
+    if provides == "get flows" and len(data) == 1 and 'vault_id' in data[0] and 'file_name' in data[0]:
+        ctx_result['export'] = data[0]
+        ctx_result['data'] = []
+        return ctx_result
+
+    # A columnar get flows result is a single data item holding the columns of all the flows
+    if provides == "get flows" and len(data) == 1 and 'schema' in data[0] and 'columns' in data[0]:
+        data = ColumnarRows(data[0])
+
+    # Only the rows of the page are parsed and put in the context
+    if provides == "lookup ip":
+        rows, ctx_result['paging'] = _paginate_ip_flows(data, page, PAGE_SIZES[provides])
+    elif provides in PAGE_SIZES:
+        rows, ctx_result['paging'] = _paginate(data, page, PAGE_SIZES[provides])
 
     if provides == "get flows":
-        ctx_result["columns"] = _add_columns(data)
+        # The columns are those of all the flows, so that they do not change from one page to the other
+        if isinstance(data, ColumnarRows):
+            available_columns = set(data.schema)
+        else:
+            available_columns = set()
+            for item in data:
+                available_columns.update(item)
+
+        ctx_result['data'] = _parse_flows(rows)
+        ctx_result["columns"] = _add_columns(available_columns)
+        return ctx_result
+
+    if provides == "lookup ip":
+        ctx_result['data'] = _parse_data(rows, provides)
+        return ctx_result
+
+    ctx_result['data'] = _parse_data(data, provides)
 
     return ctx_result
 
 
-def _add_columns(data):
+def _add_columns(available_columns):
     """ This function return the list of columns with contains to display in custom view.
 
-    :param data: ctx_result["data"]
+    :param available_columns: set of the keys of the flows
     :return: list of columns to display
     """
 
     columns_dict = []
-    available_columns = list(set().union(*data))
 
     # Columns to display in view
     columns_in_sequence = [
@@ -69,14 +264,95 @@ def _add_columns(data):
         {"fwd_pkts": None}, {"rev_pkts": None}, {"fwd_bytes": None}, {"rev_bytes": None}
     ]
 
-    # Get list of avaiable columns
+    # Get list of avaiable columns, a column is displayed if it is available along with at least one other column
+    if len(available_columns) < 2:
+        return columns_dict
+
     for column in columns_in_sequence:
-        if set(column.keys()) < set(available_columns):
+        if next(iter(column)) in available_columns:
             columns_dict.append(column)
 
     return columns_dict
 
 
+def _format_timestamp(timestamp, cache):
+    """ Function that formats an ISO 8601 flow timestamp in local time. Flows share seconds, hence the formatted
+    values are memoized by the second of the timestamp, its fraction is dropped by the conversion anyway.
+
+    :param timestamp: timestamp of the flow
+    :param cache: dictionary of the formatted values, keyed by second
+    :return: formatted timestamp
+    """
+
+    # A timestamp which does not end with a fraction of second is parsed as is, so that it raises the same error
+    if not FLOW_TIMESTAMP_FRACTION_REGEX.match(timestamp, 19):
+        return time.strftime(FLOW_TIME_FORMAT, time.localtime(time.mktime(time.strptime(timestamp,
+                                                                                        FLOW_TIMESTAMP_FORMAT))))
+
+    second = timestamp[:19]
+    formatted = cache.get(second)
+
+    if formatted is None:
+        formatted = cache[second] = time.strftime(FLOW_TIME_FORMAT, time.localtime(time.mktime(
+            time.strptime(timestamp, FLOW_TIMESTAMP_FORMAT))))
+
+    return formatted
+
+
+def _format_start_timestamp(start_timestamp, cache):
+    """ Function that formats a flow start timestamp, given in milliseconds, in local time. The formatted values are
+    memoized by second.
+
+    :param start_timestamp: start timestamp of the flow
+    :param cache: dictionary of the formatted values, keyed by second
+    :return: formatted start timestamp
+    """
+
+    second = int(start_timestamp) / 1000
+    formatted = cache.get(second)
+
+    if formatted is None:
+        formatted = cache[second] = time.strftime(FLOW_TIME_FORMAT, time.localtime(second))
+
+    return formatted
+
+
+def _parse_flows(data):
+    """ Function that parses the flows in a single pass, it formats their timestamps.
+
+    :param data: list of flows
+    :return: list of flows
+    """
+
+    timestamp_cache = {}
+    start_timestamp_cache = {}
+    match_fraction = FLOW_TIMESTAMP_FRACTION_REGEX.match
+
+    for item in data:
+        try:
+            # The memoized values are looked up inline, the formatting functions are only called on a miss
+            timestamp = item.get("timestamp")
+            if timestamp:
+                formatted = timestamp_cache.get(timestamp[:19]) if match_fraction(timestamp, 19) else None
+                item["timestamp"] = formatted or _format_timestamp(timestamp, timestamp_cache)
+
+            start_timestamp = item.get('start_timestamp')
+            if start_timestamp:
+                formatted = start_timestamp_cache.get(int(start_timestamp) / 1000)
+                item['start_timestamp'] = formatted or _format_start_timestamp(start_timestamp, start_timestamp_cache)
+
+            if isinstance(item['dst_scope_name'], basestring):
+                item['dst_scope_name'] = [item['dst_scope_name']]
+
+            if isinstance(item['src_scope_name'], basestring):
+                item['src_scope_name'] = [item['src_scope_name']]
+
+        except ValueError:
+            pass
+
+    return data
+
+
 def _parse_data(data, provides):
     """ Function that parse data.
 
@@ -85,9 +361,8 @@ def _parse_data(data, provides):
     """
 
     if provides == 'lookup ip':
-        data = data[0]
-        if data.get('flow'):
-            for item in data['flow']:
+        for ip_data in data:
+            for item in ip_data.get('flow') or []:
 
                 if type(item['dst_scope_name']) is unicode or type(item['dst_scope_name']) is str:
                     item['dst_scope_name'] = [item['dst_scope_name']]
@@ -97,25 +372,7 @@ def _parse_data(data, provides):
         return data
 
     if provides == "get flows":
-        for item in data:
-            try:
-                if item.get("timestamp"):
-                    item["timestamp"] = time.strftime(
-                        '%b %d %I:%M:%S %p', time.localtime(time.mktime(time.strptime(item["timestamp"],
-                                                                                      '%Y-%m-%dT%H:%M:%S.%fZ'))))
-
-                if item.get('start_timestamp'):
-                    item['start_timestamp'] = time.strftime('%b %d %I:%M:%S %p',
-                                                            time.localtime(int(item['start_timestamp']) / 1000))
-
-                if type(item['dst_scope_name']) is unicode or type(item['dst_scope_name']) is str:
-                    item['dst_scope_name'] = [item['dst_scope_name']]
-
-                if type(item['src_scope_name']) is unicode or type(item['src_scope_name']) is str:
-                    item['src_scope_name'] = [item['src_scope_name']]
-
-            except ValueError:
-                pass
+        return _parse_flows(data)
 
     return data
 
@@ -132,9 +389,17 @@ def display_view(provides, all_app_runs, context):
     context['results'] = results = []
     for summary, action_results in all_app_runs:
         for result in action_results:
-            ctx_result = _get_ctx_result(provides, result)
+            index = len(results)
+            ctx_result = _get_ctx_result(provides, result, _get_page(context, index))
             if not ctx_result:
                 continue
+
+            paging = ctx_result.get('paging')
+            if paging:
+                for key in ('previous_page', 'next_page'):
+                    if paging[key]:
+                        paging[key + '_url'] = _get_page_url(context, index, paging[key])
+
             results.append(ctx_result)
 
     if provides == "get flows":